@@ -18,6 +18,7 @@ import matplotlib.dates as mdates
 import matplotlib.patheffects as mpe
 from matplotlib.ticker import MultipleLocator
 
+import numpy as np
 import pandas as pd
 
 
@@ -160,20 +161,20 @@ if __name__ == "__main__":
     add_startend_datetime2config(config_copy)
     
     config_copy["domain"] = "southPacific"
-    list_of_cloud_bandsSP = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
+    columnsSP = load_data_from_saved_var_files(config_copy, varname="cloud_bands_columns", columns=["time_index"])
     config_copy["domain"] = "northPacific"
-    list_of_cloud_bandsNP = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
+    columnsNP = load_data_from_saved_var_files(config_copy, varname="cloud_bands_columns", columns=["time_index"])
     config_copy["domain"] = "southAtlantic"
-    list_of_cloud_bandsSA = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
+    columnsSA = load_data_from_saved_var_files(config_copy, varname="cloud_bands_columns", columns=["time_index"])
     config_copy["domain"] = "southIndianOcean"
-    list_of_cloud_bandsAIO = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
+    columnsAIO = load_data_from_saved_var_files(config_copy, varname="cloud_bands_columns", columns=["time_index"])
 
     pdlist_dates = pd.date_range(start=config_copy["datetime_startdate"], end=config_copy["datetime_enddate"], freq="D")
     # -> number of cloud bands for each day
-    nb_cb_each_dateSP = [len(el) for el in list_of_cloud_bandsSP]
-    nb_cb_each_dateNP = [len(el) for el in list_of_cloud_bandsNP]
-    nb_cb_each_dateSA = [len(el) for el in list_of_cloud_bandsSA]
-    nb_cb_each_dateAIO = [len(el) for el in list_of_cloud_bandsAIO]
+    nb_cb_each_dateSP = np.bincount(columnsSP["time_index"], minlength=int(columnsSP["ntimes"]))
+    nb_cb_each_dateNP = np.bincount(columnsNP["time_index"], minlength=int(columnsNP["ntimes"]))
+    nb_cb_each_dateSA = np.bincount(columnsSA["time_index"], minlength=int(columnsSA["ntimes"]))
+    nb_cb_each_dateAIO = np.bincount(columnsAIO["time_index"], minlength=int(columnsAIO["ntimes"]))
 
     # -> to pandas for easier data handling
     list4pandas = [
@@ -74,12 +74,10 @@ if __name__ == "__main__":
     config_copy["enddate"] = "20211231.00"
     add_startend_datetime2config(config_copy)
     
-    list_of_cloud_bandsSP = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
+    # only the areas of the cloud bands are needed, the masks are not loaded
+    cb_areaSP = load_data_from_saved_var_files(config_copy, varname="cloud_bands_columns", columns=["area"])["area"]
     config_copy["select_djfm"] = True
-    list_of_cloud_bandsSP_djfm = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
-    # flatten list of cloud band areas
-    cb_areaSP = [cb.area for sublist in list_of_cloud_bandsSP for cb in sublist]
-    cb_areaSP_djfm = [cb.area for sublist in list_of_cloud_bandsSP_djfm for cb in sublist]
+    cb_areaSP_djfm = load_data_from_saved_var_files(config_copy, varname="cloud_bands_columns", columns=["area"])["area"]
     fig = plot_distribution_cb_area(cb_areaSP, cb_areaSP_djfm)
     fig.show()
     figurename = f"{config_copy['dir_figures']}/distribution_cb_area_{config_copy['datetime_startdate'].year}_{config_copy['datetime_enddate'].year}_fullperiod_vs_djfm_{config_copy['domain']}.png"
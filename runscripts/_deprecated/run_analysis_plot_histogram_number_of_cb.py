@@ -61,12 +61,12 @@ if __name__ == "__main__":
     config_copy["enddate"] = "20211231.00"
     add_startend_datetime2config(config_copy)
     # Load cloud bands
-    list_of_cloud_bandsSP = load_data_from_saved_var_files(config, varname="list_of_cloud_bands")
+    columnsSP = load_data_from_saved_var_files(config, varname="cloud_bands_columns", columns=["time_index"])
     config["select_djfm"] = True
-    list_of_cloud_bandsSP_djfm = load_data_from_saved_var_files(config, varname="list_of_cloud_bands")
+    columnsSP_djfm = load_data_from_saved_var_files(config, varname="cloud_bands_columns", columns=["time_index"])
     # -> number of cloud bands for each day
-    nb_cb_each_dateSP = [len(el) for el in list_of_cloud_bandsSP]
-    nb_cb_each_dateSP_djfm = [len(el) for el in list_of_cloud_bandsSP_djfm]
+    nb_cb_each_dateSP = np.bincount(columnsSP["time_index"], minlength=int(columnsSP["ntimes"]))
+    nb_cb_each_dateSP_djfm = np.bincount(columnsSP_djfm["time_index"], minlength=int(columnsSP_djfm["ntimes"]))
     figurename = f"{config['dir_figures']}/histogram_cb_{config['datetime_startdate'].year}_{config['datetime_enddate'].year}_fullmonth_vs_djfm_{config['domain']}.png"
     fig = plot_histogram_number_of_cloudbands(nb_cb_each_dateSP, nb_cb_each_dateSP_djfm)
     fig.show()
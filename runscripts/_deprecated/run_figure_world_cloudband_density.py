@@ -6,7 +6,7 @@ Here we aim at plotting a world map overlayed by cloud bands of each hemisphere
 to obtain a world climatology of cloud band density
 
 0. You must have saved cloud band data first for both hemispheres
-1. Load data: list_of_cloud_bands to compute density of cb
+1. Load data: list_of_cloud_bands (or the columnar catalogues) to compute density of cb
 2. Load one year for lon, lat
 3. Plot a map
 
@@ -32,11 +32,18 @@ except ImportError:
     pass
 
 
+from cloudbandpy.density import add_catalogue_to_density, make_density_accumulator
 from cloudbandpy.figure_tools import set_fontsize
-from cloudbandpy.io_utilities import load_ymlfile, load_data_from_saved_var_files
+from cloudbandpy.io_utilities import (
+    cloudbands_extension,
+    load_ymlfile,
+    load_data_from_saved_var_files,
+    yearly_cloudbands_filename,
+    yearly_list_of_dates,
+)
 from cloudbandpy.misc import parse_arguments
 from cloudbandpy.time_utilities import add_startend_datetime2config, create_list_of_dates
-from cloudbandpy.tracking import compute_density
+from cloudbandpy.tracking import compute_density, density_from_accumulator
 
 
 def overlay_array_on_map_withlatitudes(
@@ -54,6 +61,21 @@ def overlay_array_on_map_withlatitudes(
     return final_array
 
 
+def compute_density_from_saved_files(config: dict, lats: np.ndarray, lons: np.ndarray, dates: list) -> tuple:
+    """
+    Density of the saved cloud bands (see tracking.compute_density). The columnar catalogues are read one year after
+    the other without building the cloud bands
+    """
+    if cloudbands_extension(config) != ".npz":
+        list_of_cloud_bands = load_data_from_saved_var_files(config, varname="list_of_cloud_bands")
+        return compute_density(lats=lats, lons=lons, dates=dates, list_of_cloud_bands=list_of_cloud_bands)
+    accumulator = make_density_accumulator((len(lats), len(lons)))
+    for iyear in range(int(config["datetime_startdate"].year), int(config["datetime_enddate"].year) + 1):
+        filename = f"{config['saved_dirpath']}/{yearly_cloudbands_filename(config, iyear)}"
+        add_catalogue_to_density(accumulator, filename, yearly_list_of_dates(config, iyear))
+    return density_from_accumulator(accumulator, dates)
+
+
 def create_worldmap_density(density, lons, lats):
     # 4. Create figure
     set_fontsize(size=16)
@@ -118,26 +140,20 @@ if __name__ == "__main__":
     
     # 1.3 Load cloud bands from the southern hemisphere (default config_copy is for southern hemisphere)
     listofdates = create_list_of_dates(config_copy)
-    list_of_cloud_bandssh = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
 
     # 1.4 Compute density for the southern hemisphere
-    ntot_cbsh, densitysh = compute_density(
-        lats=latssh, lons=lons_globe, dates=listofdates, list_of_cloud_bands=list_of_cloud_bandssh
-    )
+    ntot_cbsh, densitysh = compute_density_from_saved_files(config_copy, lats=latssh, lons=lons_globe, dates=listofdates)
 
     # 2.1 Load cloud bands and dates from the northern hemisphere
     config_copy["domain"] = "northernhemisphere"
     config_copy["lat_north"] = 50
     config_copy["lat_south"] = 10
-    list_of_cloud_bandsnh = load_data_from_saved_var_files(config_copy, varname="list_of_cloud_bands")
 
     # 2.2 Create latitudes of northern hemisphere
     latsnh = np.arange(config_copy["lat_south"], config_copy["lat_north"]+.5, +.5)
 
     # 2.3 Compute density for the northern hemisphere
-    ntot_cbnh, densitynh = compute_density(
-        lats=latsnh, lons=lons_globe, dates=listofdates, list_of_cloud_bands=list_of_cloud_bandsnh
-    )
+    ntot_cbnh, densitynh = compute_density_from_saved_files(config_copy, lats=latsnh, lons=lons_globe, dates=listofdates)
 
     # 3. Overlay southern hemisphere densities over an empty world map
     world_density = overlay_array_on_map_withlatitudes(
@@ -11,17 +11,20 @@ import os
 
 from cloudbandpy.load_driver import run_load_data
 
-from cloudbandpy.cb_detection import detection_workflow
+from cloudbandpy.cb_detection import detection_workflow, iter_detection_workflow
 from cloudbandpy.figure_tools import *
 from cloudbandpy.io_utilities import (
     logging_setup,
+    load_tracking_state,
     load_ymlfile,
     pickle_save_cloudbands,
+    save_candidates_catalogue,
+    save_tracking_state,
     write_cloud_bands_to_netcdf,
 )
 from cloudbandpy.misc import parse_arguments
 from cloudbandpy.time_utilities import create_list_of_dates
-from cloudbandpy.tracking import tracking, compute_density, plot_tracking_on_map
+from cloudbandpy.tracking import tracking_from_maps, compute_density, plot_tracking_on_map
 
 logging_setup()
 logger = logging.getLogger(__name__)
@@ -32,27 +35,78 @@ def run(config: dict):
     listofdates = create_list_of_dates(config)
     variable2process, parameters, lats, lons, resolution = run_load_data(config)
     # Cloud band detection
-    (
-        fill_binarize_data,
-        dilation,
-        labelled_blobs,
-        labelled_candidates,
-        cloud_bands_over_time,
-        list_of_candidates,
-        list_of_cloud_bands,
-    ) = detection_workflow(
-        var2process=variable2process,
-        parameters=parameters,
-        latitudes=lats,
-        longitudes=lons,
-        resolution=resolution,
-        listofdates=listofdates,
-        config=config,
+    # Intermediate arrays of the detection (binarized data, blobs, candidates, map of cloud bands) are only kept
+    # if a figure needs them. Otherwise, the detection is streamed one time after the other (chunks of times among processes)
+    figures_need_intermediates = any(
+        config[flag]
+        for flag in (
+            "fig_detection_process",
+            "fig_time_evolution_object",
+            "fig_time_evolution_var_cloudband",
+            "fig_overlay_cloudband",
+            "fig_show_bbox_around_blobs",
+        )
     )
+    if figures_need_intermediates:
+        (
+            fill_binarize_data,
+            dilation,
+            labelled_blobs,
+            labelled_candidates,
+            cloud_bands_over_time,
+            list_of_candidates,
+            list_of_cloud_bands,
+        ) = detection_workflow(
+            var2process=variable2process,
+            parameters=parameters,
+            latitudes=lats,
+            longitudes=lons,
+            resolution=resolution,
+            listofdates=listofdates,
+            config=config,
+        )
+    else:
+        fill_binarize_data = dilation = labelled_blobs = labelled_candidates = None
+        cloud_bands_over_time = list_of_candidates = None
+        # Candidates are only kept if they are saved in the catalogue
+        save_candidates = config.get("save_candidates", False)
+        list_of_cloud_bands = []
+        if save_candidates:
+            list_of_candidates = []
+        for record in iter_detection_workflow(
+            var2process=variable2process,
+            parameters=parameters,
+            latitudes=lats,
+            longitudes=lons,
+            resolution=resolution,
+            listofdates=listofdates,
+            config=config,
+            keep_intermediates=save_candidates,
+            workers=config.get("workers", 1),
+        ):
+            list_of_cloud_bands.append(record["cloud_bands"])
+            if save_candidates:
+                list_of_candidates.append(record["candidates"])
+    # Save the candidates (before tracking) to select cloud bands with other criteria later (see run_refilter_candidates.py)
+    if config.get("save_candidates", False):
+        save_candidates_catalogue(config, parameters, list_of_candidates, lons, lats)
     # Tracking
     if config["run_inheritance_tracking"]:
+        # The tracking resumes from the state saved at the end of the previous period (eg. previous year)
+        tracking_state = load_tracking_state(config) if config.get("tracking_checkpoint", False) else None
         # Update the list of cloud bands
-        list_of_cloud_bands = tracking(list_of_cloud_bands, resolution, overlapfactor=parameters["othresh"])
+        # Overlaps between consecutive days are computed from the maps of cloud bands (made on the fly if streamed)
+        list_of_cloud_bands = tracking_from_maps(
+            list_of_cloud_bands,
+            resolution,
+            overlapfactor=parameters["othresh"],
+            cloud_bands_map=cloud_bands_over_time,
+            state=tracking_state,
+            lookback=parameters.get("lookback", 1),
+            workers=config.get("workers", 1),
+        )
+        if tracking_state is not None:
+            save_tracking_state(config, tracking_state)
     # Save cloud bands
     if config["save_listcloudbands"]:
         pickle_save_cloudbands(config, list_of_cloud_bands)
@@ -19,18 +19,24 @@ Run: python cloudbandPy/runscripts/run_analysis_olr_auto_thresholding.py cloudba
 import matplotlib.pyplot as plt
 from matplotlib.ticker import MultipleLocator, AutoMinorLocator
 import numpy as np
-from skimage.filters import threshold_otsu, threshold_yen
-from skimage import exposure
 import os
 
 from cloudbandpy.figure_tools import set_fontsize
 from cloudbandpy.io_utilities import load_ymlfile, load_data_from_saved_var_files
 from cloudbandpy.misc import parse_arguments
+from cloudbandpy.olr_histogram import add_frame_histogram, frame_histogram, histogram_threshold, make_histogram_accumulator
 
 def get_histogram(variable4analyis):
-    valyen = [threshold_yen(var) for var in variable4analyis]
-    valotsu = [threshold_otsu(var) for var in variable4analyis]
-    hist, bins_center = exposure.histogram(np.concatenate(variable4analyis).ravel())
+    # One histogram per day over fixed bins gives the thresholds of the day and is accumulated for the whole period
+    accumulator = make_histogram_accumulator()
+    bin_edges = accumulator["bin_edges"]
+    valyen, valotsu = [], []
+    for var in variable4analyis:
+        counts = frame_histogram(var, bin_edges)
+        add_frame_histogram(accumulator, counts)
+        valyen.append(histogram_threshold(counts, bin_edges, "yen"))
+        valotsu.append(histogram_threshold(counts, bin_edges, "otsu"))
+    hist, bins_center = accumulator["counts"], 0.5 * (bin_edges[1:] + bin_edges[:-1])
     return valyen, valotsu, hist, bins_center
 
 def plot_histogram(valyen, valotsu, hist, bins_center):
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+This script converts the yearly files of the daily variable (saved by run.py with save_dailyvar: True)
+of the years of the configuration file into one consolidated store, memory-mapped by
+load_data_from_saved_var_files when load_saved_files is True.
+
+Run cloudbandPy/runscripts/run_convert_dailyvar_to_store.py cloudbandPy/config/config_analysis.yml
+"""
+
+import logging
+
+from cloudbandpy.io_utilities import convert_dailyvar_files_to_store, load_ymlfile, logging_setup
+from cloudbandpy.misc import parse_arguments
+
+logging_setup()
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    config = load_ymlfile(args.config_file, isconfigfile=True)
+    convert_dailyvar_files_to_store(config)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+This script selects cloud bands among the candidates saved by a previous run of the detection (save_candidates: True)
+with the angle and latitude criteria of the parameters file, and runs the tracking.
+The input data are not loaded and the detection is not run again. The candidates catalogue must have been computed
+with the same preprocessing and thresholds (OLR_THRESHOLD, thresholding_method and CLOUD_BAND_AREA_THRESHOLD).
+
+Run cloudbandPy/runscripts/run_refilter_candidates.py cloudbandPy/config/config_cbworkflow_southPacific.yml
+"""
+
+import logging
+
+from cloudbandpy.cb_detection import refilter_candidates
+from cloudbandpy.io_utilities import (
+    logging_setup,
+    load_candidates_catalogue,
+    load_ymlfile,
+    pickle_save_cloudbands,
+)
+from cloudbandpy.misc import compute_resolution, parse_arguments
+from cloudbandpy.tracking import tracking_from_maps
+
+logging_setup()
+logger = logging.getLogger(__name__)
+
+
+def run_refilter(config: dict):
+    parameters = load_ymlfile(config["parameters_file"])
+    list_of_candidates, lons, lats = load_candidates_catalogue(config, parameters)
+    # Cloud bands selection with the criteria of the parameters
+    list_of_cloud_bands = refilter_candidates(list_of_candidates, parameters)
+    logger.info(f"{sum(len(cloud_bands) for cloud_bands in list_of_cloud_bands)} cloud bands selected")
+    # Tracking
+    if config["run_inheritance_tracking"]:
+        resolution = compute_resolution(lons, lats)
+        list_of_cloud_bands = tracking_from_maps(
+            list_of_cloud_bands, resolution, overlapfactor=parameters["othresh"], lookback=parameters.get("lookback", 1)
+        )
+    # Save cloud bands
+    if config["save_listcloudbands"]:
+        pickle_save_cloudbands(config, list_of_cloud_bands)
+    return list_of_cloud_bands
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    config = load_ymlfile(args.config_file, isconfigfile=True)
+    run_refilter(config)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+This script links the cloud bands of the first day of a period to the cloud bands of the last day of the previous period,
+when periods (eg. years) have been detected and tracked independently, eg. in parallel.
+It needs the list of cloud bands of the period and the tracking state of the previous period,
+saved by run.py with save_listcloudbands: True and tracking_checkpoint: True. The list of cloud bands is updated.
+
+Run cloudbandPy/runscripts/run_stitch_tracking.py cloudbandPy/config/config_cbworkflow_southPacific.yml
+"""
+
+import logging
+
+from cloudbandpy.io_utilities import (
+    cloudbands_filename,
+    load_list,
+    load_tracking_state,
+    load_ymlfile,
+    logging_setup,
+    pickle_save_cloudbands,
+)
+from cloudbandpy.misc import parse_arguments
+from cloudbandpy.tracking import stitch_tracking
+
+logging_setup()
+logger = logging.getLogger(__name__)
+
+
+if __name__ == "__main__":
+    args = parse_arguments()
+    config = load_ymlfile(args.config_file, isconfigfile=True)
+    parameters = load_ymlfile(config["parameters_file"])
+    list_of_cloud_bands = load_list(cloudbands_filename(config))
+    tracking_state = load_tracking_state(config)
+    list_of_cloud_bands = stitch_tracking(
+        list_of_cloud_bands, tracking_state, overlapfactor=parameters["othresh"], lookback=parameters.get("lookback", 1)
+    )
+    pickle_save_cloudbands(config, list_of_cloud_bands)
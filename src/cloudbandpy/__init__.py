@@ -4,3 +4,8 @@ from . import io_utilities
 from . import cb_detection
 from . import figure_tools
 from . import load_driver
+from . import density
+from . import kinematics
+from . import merge_domains
+from . import olr_histogram
+from . import threshold_sweep
@@ -4,20 +4,39 @@
 Functions to detect cloud bands from outgoing longwave radiations
 """
 
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime as dt
+from itertools import islice
 import logging
+from multiprocessing import shared_memory
 import numpy as np
 from scipy import ndimage as ndi
 from skimage import measure, morphology
-from skimage.filters import threshold_otsu, threshold_yen
 
 from .cloudband import CloudBand
+from .olr_histogram import (
+    OLR_BIN_EDGES,
+    add_frame_histogram,
+    frame_histogram,
+    histogram_threshold,
+    make_histogram_accumulator,
+)
 from .time_utilities import convert_date2num
-from .misc import wrapTo360
+
+# Histogram-based thresholding methods: threshold of each frame, or running climatological threshold
+HISTOGRAM_THRESHOLDING_METHODS = ("yen", "otsu", "yen_climatology", "otsu_climatology")
+# Number of frames sent at once to a process of the pool by the streaming detection
+DETECTION_CHUNK_SIZE = 16
 
 
 def blob_detection(
-    input_variable: np.ndarray, parameters: dict, resolution: np.ndarray, connectlongitudes: bool = False
+    input_variable: np.ndarray,
+    parameters: dict,
+    resolution: np.ndarray,
+    connectlongitudes: bool = False,
+    return_stats: bool = False,
+    histogram_accumulator: dict = None,
 ):
     """
     This function uses morphological labelling, ie blob detection, to detect cloud bands
@@ -25,20 +44,35 @@ def blob_detection(
         - input_variable: variable which will be processed and from which blobs of clouds will be detected
         - thresh_value: threshold value we will use to detect cloud bands
         - cloud_band_area_threshold: en m2
+        - return_stats: if True, also return the statistics of the cloud band candidates (see compute_blob_statistics)
+        - histogram_accumulator: if given, the histogram of the input variable is added to it (see olr_histogram)
     Output:
         - detected_blobs: a map of blobs
     Side note: One could use the Yen (or Ostu) global thresholding method, change in parameters. For testing purpose, note for research.
+    "yen" and "otsu" use the histogram of the input variable, "yen_climatology" and "otsu_climatology" the histogram
+    accumulated in histogram_accumulator (running climatological threshold).
     """
     logger = logging.getLogger("cb_detection.blob_detection")
     cloud_band_area_threshold = float(parameters["CLOUD_BAND_AREA_THRESHOLD"])
     # Threshold value
-    # We add the possibility to use histogram based methods. By default, it will use the specific threshold.      
-    if str(parameters["thresholding_method"]).lower() == "yen":
-        thresh_value = threshold_yen(input_variable)
-        logger.warning(f"Use Yen thresholding method. Threshold:{thresh_value}")
-    elif str(parameters["thresholding_method"]).lower() == "otsu":
-        thresh_value = threshold_otsu(input_variable)
-        logger.warning(f"Use Otsu thresholding method. Threshold:{thresh_value}")
+    # We add the possibility to use histogram based methods. By default, it will use the specific threshold.
+    # The histogram of the frame is computed once over fixed bins
+    thresholding_method = str(parameters["thresholding_method"]).lower()
+    if thresholding_method in HISTOGRAM_THRESHOLDING_METHODS or histogram_accumulator is not None:
+        bin_edges = OLR_BIN_EDGES if histogram_accumulator is None else histogram_accumulator["bin_edges"]
+        counts = frame_histogram(input_variable, bin_edges)
+        if histogram_accumulator is not None:
+            add_frame_histogram(histogram_accumulator, counts)
+    if thresholding_method in ("yen", "otsu"):
+        thresh_value = histogram_threshold(counts, bin_edges, thresholding_method)
+        logger.warning(f"Use {thresholding_method.capitalize()} thresholding method. Threshold:{thresh_value}")
+    elif thresholding_method in ("yen_climatology", "otsu_climatology"):
+        if histogram_accumulator is None:
+            raise ValueError(f"{thresholding_method} thresholding method needs a histogram accumulator")
+        thresh_value = histogram_threshold(
+            histogram_accumulator["counts"], bin_edges, thresholding_method.replace("_climatology", "")
+        )
+        logger.warning(f"Use {thresholding_method} thresholding method. Threshold:{thresh_value}")
     else:
         thresh_value = parameters["OLR_THRESHOLD"]
     # Sanitize input. make sure all values < 0 are all set to 0
@@ -50,7 +84,11 @@ def blob_detection(
     # We apply a morphological dilation: adds pixels to the boundaries of each objects
     dilation = morphology.dilation(fill_binarize_data)
     # -- Connected Components Labelling
-    labelled_blobs = measure.label(dilation, connectivity=2, background=0)
+    # If hemispheric detection (0-360°), first and last longitudes must be connected
+    if connectlongitudes:
+        labelled_blobs = label_with_periodic_longitudes(dilation, connectivity=2)
+    else:
+        labelled_blobs = measure.label(dilation, connectivity=2, background=0)
     """
     labelled_blobs =
     array([[ 1,  1,  1, ...,  0,  0,  0],
@@ -61,79 +99,142 @@ def blob_detection(
         [ 0,  0,  0, ...,  0, 26, 26],
         [ 0,  0,  0, ..., 26, 26, 26]], dtype=int32)
     """
-    # -- If hemispheric detection (0-360°), first and last longitudes must be connected
-    # Consolidate blob's labels
-    if connectlongitudes:
-        consolidated_labels = connectLongitudes(labelled_blobs)
-        # copy to avoid side effects
-        labelled_blobs = np.copy(consolidated_labels)
-    # Compute cluster areas and sort them from largest to smallest for further speed up the process
+    # Compute the statistics (area, bounding box, moments) of all blobs in one pass over the labelled image
     # background (cluster)'s label = 0
-    # --> blobs_size, sorted_blobs and cloudband_candidate are like [[cluster ID, cluster area], ...]
-    blobs_size = [
-        [i, compute_blob_area(labelled_blobs, i, resolution=resolution)] for i in range(1, labelled_blobs.max() + 1)
-    ]
-    sorted_blobs = sorted(blobs_size, key=lambda c: c[1], reverse=True)
+    blobs_stats = compute_blob_statistics(labelled_blobs, resolution=resolution)
     # --  Filtering
     # 1) We filter blobs according to their area (subjective threshold).
-    #    We filter out the largest cloud bands from the 'sorted_blobs' list according to 'cloud_band_area_threshold'
-    cloudband_candidate = [
-        el for idx, el in enumerate(sorted_blobs) if sorted_blobs[idx][1] >= cloud_band_area_threshold
-    ]
-    # 2) We make an array/map of these cloud band candidates
-    labelled_candidates = np.zeros_like(labelled_blobs, dtype=np.uint8)
-    for idx in [idcb[0] for idcb in cloudband_candidate]:
-        labelled_candidates[labelled_blobs == idx] = idx
+    #    We keep the blobs whose area is larger than 'cloud_band_area_threshold'
+    iscandidate = blobs_stats["area"] >= cloud_band_area_threshold
+    iscandidate[0] = False
+    # 2) We make an array/map of these cloud band candidates with a lookup table: label -> label or 0 (background)
+    # Labels are stored with the narrowest dtype that holds them
+    lookup_table = np.where(iscandidate, blobs_stats["label"], 0).astype(label_dtype(blobs_stats["label"][-1]))
+    labelled_candidates = lookup_table[labelled_blobs]
     #
+    if return_stats:
+        candidates_stats = {key: value[iscandidate] for key, value in blobs_stats.items()}
+        return fill_binarize_data, dilation, labelled_blobs, labelled_candidates, candidates_stats
     return fill_binarize_data, dilation, labelled_blobs, labelled_candidates
 
 
-def candidates2class(labelled_candidates, date, resolution, lons, lats):
+def candidates2class(labelled_candidates, date, resolution, lons, lats, candidates_stats: dict = None):
     """
     Transform cloud band candidates into a CloudBand class
+    The geometric properties of the candidates are read from 'candidates_stats' (see compute_blob_statistics).
+    If not provided, they are computed from 'labelled_candidates'
     """
     logger = logging.getLogger("cb_detection.candidates2class")
+    if candidates_stats is None:
+        candidates_stats = compute_blob_statistics(labelled_candidates, resolution=resolution)
+    if "angle" not in candidates_stats:
+        candidates_stats = compute_candidates_geometry(candidates_stats, lons, lats)
+    # tranform panda timestamp date into integer
+    cb_date = int(date.strftime("%Y%m%d%H%M%S"))
     list_candidates = []
-    for ilabel in set(labelled_candidates[np.where(labelled_candidates != 0)]):
-        icloudband = np.zeros_like(labelled_candidates, dtype=np.uint8)
-        # Binarize array into 0-1 array
-        icloudband[np.where(labelled_candidates == ilabel)] = 1
-        cb_area = compute_blob_area(icloudband, 1, resolution)
-        # tranform panda timestamp date into integer
-        cb_date = int(date.strftime("%Y%m%d%H%M%S"))
-        cb_lon, cb_lat = get_cloudband_latlon(icloudband, lons, lats)
-        # If the cloud band crosses the edges of the (worldwide) domain,
-        # the longitudes on the longitudinal edges are connected, we flag the candidate as such
-        connected_longitudes = False
-        if wrapTo360(np.nanmin(cb_lon)) == 0.0 and wrapTo360(np.nanmax(cb_lon)) > 250.0:
-            connected_longitudes = True
-        # Geometric properties are computed here and then incorporated into the class
-        regions_props = measure.regionprops(icloudband)[0] # return a list, here we've got only one cloud band --> [0]
-        # angle between the minor axis and the horizontal, at the centroid
-        angle = (regions_props.orientation * 360) / (2 * np.pi)
-        # center of ellipse around cloud band
-        centroid = regions_props.centroid
-        lon_centroid, lat_centroid = (
-            lons[int(centroid[1])].item(),
-            lats[int(centroid[0])].item(),
-        )
+    for icandidate, ilabel in enumerate(candidates_stats["label"]):
+        if ilabel == 0 or candidates_stats["npixels"][icandidate] == 0:
+            continue
+        # Binarize array into 0-1 array. Only the bounding box of the candidate needs to be scanned
+        row_min, row_max = candidates_stats["row_min"][icandidate], candidates_stats["row_max"][icandidate]
+        col_min, col_max = candidates_stats["col_min"][icandidate], candidates_stats["col_max"][icandidate]
+        # The cloud band is stored as its mask cropped to the bounding box
+        bbox = (slice(row_min, row_max + 1), slice(col_min, col_max + 1))
+        icloudband = (labelled_candidates[bbox] == ilabel).astype(np.uint8)
+        lon_centroid = candidates_stats["lon_centroid"][icandidate].item()
+        if candidates_stats["connected_longitudes"][icandidate]:
+            # the mean of the longitudes is on the other side of the globe for cloud bands across the seam
+            lon_centroid = circular_mean_longitude(icloudband, lons[bbox[1]], lons)
         # Setting up cloud band object
         cloud = CloudBand(
             cloud_band_array=icloudband,
             date=cb_date,
-            area=cb_area,
-            lats=cb_lat,
-            lons=cb_lon,
-            angle=angle,
+            area=candidates_stats["area"][icandidate],
+            lats=lats[bbox[0]],
+            lons=lons[bbox[1]],
+            angle=candidates_stats["angle"][icandidate],
             lon_centroid=lon_centroid,
-            lat_centroid=lat_centroid,
+            lat_centroid=candidates_stats["lat_centroid"][icandidate].item(),
             iscloudband=False,
-            connected_longitudes=connected_longitudes,
+            connected_longitudes=bool(candidates_stats["connected_longitudes"][icandidate]),
+            lat_min=candidates_stats["lat_min"][icandidate].item(),
+            lat_max=candidates_stats["lat_max"][icandidate].item(),
+            offset=(row_min, col_min),
+            domain_shape=labelled_candidates.shape,
+            index=int(candidates_stats["index"][icandidate]) if "index" in candidates_stats else icandidate,
         )
         list_candidates.append(cloud)
     return list_candidates
 
 
+def circular_mean_longitude(mask: np.ndarray, mask_lons: np.ndarray, lons: np.ndarray) -> float:
+    """
+    Longitude of the centroid of a cloud band crossing the 0/360 seam (connected_longitudes):
+    circular mean of the longitudes of its grid points, in the range of the longitudes of the domain
+    Args:
+        - mask: mask of the cloud band (cropped to its bounding box)
+        - mask_lons: longitudes of the columns of the mask
+        - lons: longitudes of the domain
+    """
+    npoints = mask.sum(axis=0)
+    angles = np.deg2rad(mask_lons)
+    mean_lon = np.rad2deg(np.arctan2(np.sum(npoints * np.sin(angles)), np.sum(npoints * np.cos(angles))))
+    return float(lons.min() + (mean_lon - lons.min()) % 360.0)
+
+
+def compute_candidates_geometry(candidates_stats: dict, lons: np.ndarray, lats: np.ndarray) -> dict:
+    """
+    Add to the statistics of the candidates (see compute_blob_statistics) the geometric properties
+    used to select cloud bands, using the longitudes and latitudes of the domain (assumed monotonic):
+    angle, lon_centroid, lat_centroid, lat_min, lat_max and connected_longitudes,
+    and the index of the candidates (position in the table), from which the ids of the cloud bands are built
+    Returns: a new dictionary of arrays
+    """
+    candidates_geometry = dict(candidates_stats)
+    candidates_geometry["index"] = np.arange(len(candidates_stats["label"]))
+    # angle between the minor axis and the horizontal, at the centroid
+    candidates_geometry["angle"] = (candidates_stats["orientation"] * 360) / (2 * np.pi)
+    # center of ellipse around cloud band
+    candidates_geometry["lon_centroid"] = lons[candidates_stats["col_centroid"].astype(int)]
+    candidates_geometry["lat_centroid"] = lats[candidates_stats["row_centroid"].astype(int)]
+    # Latitudinal extent, from the rows of the bounding box
+    lats_top, lats_bottom = lats[candidates_stats["row_min"]], lats[candidates_stats["row_max"]]
+    candidates_geometry["lat_min"] = np.minimum(lats_top, lats_bottom)
+    candidates_geometry["lat_max"] = np.maximum(lats_top, lats_bottom)
+    # If the cloud band crosses the edges of the (worldwide) domain,
+    # the longitudes on the longitudinal edges are connected, we flag the candidate as such
+    lons_west, lons_east = lons[candidates_stats["col_min"]], lons[candidates_stats["col_max"]]
+    lons_min, lons_max = np.minimum(lons_west, lons_east), np.maximum(lons_west, lons_east)
+    # (wrapped to 0-360°)
+    lons_min = np.where(lons_min < 0.0, lons_min + 360.0, lons_min)
+    lons_max = np.where(lons_max < 0.0, lons_max + 360.0, lons_max)
+    candidates_geometry["connected_longitudes"] = (lons_min == 0.0) & (lons_max > 250.0)
+    return candidates_geometry
+
+
+def select_cloudbands_from_statistics(candidates_geometry: dict, parameters: dict) -> np.ndarray:
+    """
+    For one time, select the cloud bands from the statistics of the candidates (see compute_candidates_geometry),
+    with the same criteria as filter_blobs2cloudbands, without building any CloudBand
+    Return: boolean array, True for the candidates that are cloud bands
+    """
+    top_lat_criteria = parameters["TOP_LATITUDE"]
+    bottom_lat_criteria = parameters["BOTTOM_LATITUDE"]
+    angle_min = parameters["ANGLE_MIN"]
+    angle_max = parameters["ANGLE_MAX"]
+    # we want to compare the long axis of the blob's ellipse: -90 in the southern hemisphere, +90 in the northern one
+    angle2longaxis = np.where(candidates_geometry["lat_centroid"] < 0.0, -90.0, +90.0)
+    angle_longaxis = candidates_geometry["angle"] + angle2longaxis
+    condition4latitudes = (candidates_geometry["lat_min"] <= bottom_lat_criteria) & (
+        candidates_geometry["lat_max"] >= top_lat_criteria
+    )
+    # We assume that if the cloud band candidate is crosing the edge of the domain (map), it has an acceptable angle
+    condition4angle = candidates_geometry["connected_longitudes"] | (
+        (angle_min < angle_longaxis) & (angle_longaxis < angle_max)
+    )
+    return condition4latitudes & condition4angle
+
+
 def filter_blobs2cloudbands(list_candidates: list, parameters: dict) -> np.ndarray:
     """
     For one time, select the cloud bands from candidates.
@@ -151,8 +252,8 @@ def filter_blobs2cloudbands(list_candidates: list, parameters: dict) -> np.ndarr
     list_of_cloud_bands = []
     for iblob in list_candidates:
         blob_center_lat = iblob.lat_centroid
-        blob_max_lat = np.nanmax(iblob.lats)
-        blob_min_lat = np.nanmin(iblob.lats)
+        blob_max_lat = iblob.lat_max
+        blob_min_lat = iblob.lat_min
         # we want to compare the long axis of the blob's ellipse
         if blob_center_lat < 0.0:
             # southern hemisphere
@@ -177,6 +278,22 @@ def filter_blobs2cloudbands(list_candidates: list, parameters: dict) -> np.ndarr
     return list_of_cloud_bands
 
 
+def refilter_candidates(list_of_candidates: list, parameters: dict) -> list:
+    """
+    Select again the cloud bands among the candidates of all times (eg. loaded from a candidates catalogue)
+    with the criteria of the parameters (angles and latitudes). Previous selection and inheritance are discarded.
+    Args: list of lists of candidates (1 list per time)
+    Returns: list of lists of cloud bands (1 list per time)
+    """
+    list_of_cloud_bands = []
+    for candidates in list_of_candidates:
+        for candidate in candidates:
+            candidate.iscloudband = False
+            candidate.parents = set()
+        list_of_cloud_bands.append(filter_blobs2cloudbands(candidates, parameters))
+    return list_of_cloud_bands
+
+
 def detection_workflow(
     var2process: np.ndarray,
     parameters: dict,
@@ -185,6 +302,8 @@ def detection_workflow(
     resolution: np.ndarray,
     listofdates,
     config: dict,
+    workers: int = None,
+    histogram_accumulator: dict = None,
 ):
     """
     Runs the detection of cloud bands by firstly processing the input variable with morphological and labelling operations,
@@ -197,64 +316,439 @@ def detection_workflow(
         - resolution: array of the data resolution (length of the longitudes)
         - config: configurations needed to check whether it's needed to connect longitudes
             (hemispheric detection) in order to connect cloud bands that extend from 359° to 0°.
+        - workers: number of processes among which the timesteps are spread. If None, 'workers' from the config
+            is used (1 by default, ie. serial detection)
+        - histogram_accumulator: if given, the histograms of the frames are added to it (see olr_histogram)
     Returns
         - fill_binarize_data: binarized data
         - dilation: after thresholding the data, they are dilated to expand from the threshold value
         - labelled_blobs: all the blobs that have been labelled after dilation
         - labelled_candidates: candidate blobs that can be cloud bands
-        - cloud_bands_map: actual cloud bands after applying the criteria
+        - cloud_bands_map: actual cloud bands after applying the criteria. Each cloud band is labelled by its index
+            in the list of cloud bands of the time + 1 (see make_cloud_bands_ids_table to get the ids)
+        Arrays of labels use the narrowest unsigned dtype holding the largest label of the period
     """
     logger = logging.getLogger("cb_detection.detection_workflow")
     logger.info("Cloud band detection in progress")
+    if workers is None:
+        workers = int(config.get("workers", 1))
+    # The running climatological threshold and the accumulation of histograms need the times in order
+    if workers > 1 and (
+        histogram_accumulator is not None or str(parameters["thresholding_method"]).lower().endswith("_climatology")
+    ):
+        logger.info("Histograms of the frames are accumulated in time order: serial detection")
+        workers = 1
     fill_binarize_data = np.zeros_like(var2process, dtype=np.uint8)
     dilation = np.zeros_like(var2process, dtype=np.uint8)
+    # Arrays of labels start with the narrowest dtype and are widened if a time has more labels than the dtype holds
     labelled_blobs = np.zeros_like(var2process, dtype=np.uint8)
     labelled_candidates = np.zeros_like(var2process, dtype=np.uint8)
-    cloud_bands_map = np.zeros_like(var2process, dtype=np.uint64)
+    cloud_bands_map = np.zeros_like(var2process, dtype=np.uint8)
     list_of_candidates = []
     list_of_cloud_bands = []
-    connectlongitudes = False
-    # If hemispheric detection (0-360°), first and last longitudes must be connected
-    if abs(config["lon_east"] - config["lon_west"]) == 360:
-        connectlongitudes = True
-        logger.info("Blobs that are longitudinally crossing the map will be connected")
     #
-    # Iteration over the time dimension. One blob-detection per timestep.
-    for idx, itime in enumerate(listofdates):
-        (
-            fill_binarize_data[idx],
-            dilation[idx],
-            labelled_blobs[idx],
-            labelled_candidates[idx],
-        ) = blob_detection(var2process[idx], parameters, resolution, connectlongitudes)
-        # Objectify the cloud band candidates
-        list_of_candidates.append(
-            candidates2class(
-                labelled_candidates[idx],
-                date=itime,
-                resolution=resolution,
-                lons=longitudes,
-                lats=latitudes
-            )
-        )
-        # Filtering out the cloud bands according the angle and "crossing the tropical line" criterion
-        # -> return for each time, an array with all cloud bands (per snapshot)
-        list_of_cloud_bands.append(
-            filter_blobs2cloudbands(
-                list_of_candidates[idx],
-                parameters=parameters,
-            )
+    if workers > 1 and len(listofdates) > 1:
+        logger.info(f"Detection spread over {workers} processes")
+        # Labels are written by the processes in wide arrays, which are narrowed afterwards
+        labelled_blobs = np.zeros_like(var2process, dtype=np.uint32)
+        labelled_candidates = np.zeros_like(var2process, dtype=np.uint32)
+        list_of_candidates, list_of_cloud_bands = _parallel_detection(
+            var2process,
+            (fill_binarize_data, dilation, labelled_blobs, labelled_candidates),
+            parameters,
+            latitudes,
+            longitudes,
+            resolution,
+            listofdates,
+            is_hemispheric_domain(config),
+            workers,
         )
+        labelled_blobs = labelled_blobs.astype(label_dtype(labelled_blobs.max(initial=0)))
+        labelled_candidates = labelled_candidates.astype(label_dtype(labelled_candidates.max(initial=0)))
         # Array of all the cloud bands for one time
-        for icb, iblob in enumerate(list_of_cloud_bands[idx]):
-            if iblob:
-                cloud_bands_map[idx] += iblob.cloud_band_array * iblob.id_
-
+        for idx, cloud_bands in enumerate(list_of_cloud_bands):
+            cloud_bands_map = _store_labels(
+                cloud_bands_map, idx, make_cloud_bands_map(cloud_bands, cloud_bands_map.shape[1:])
+            )
+    else:
+        # Iteration over the time dimension. One blob-detection per timestep.
+        for record in iter_detection_workflow(
+            var2process,
+            parameters,
+            latitudes,
+            longitudes,
+            resolution,
+            listofdates,
+            config,
+            keep_intermediates=True,
+            histogram_accumulator=histogram_accumulator,
+        ):
+            idx = record["index"]
+            fill_binarize_data[idx] = record["fill_binarize_data"]
+            dilation[idx] = record["dilation"]
+            labelled_blobs = _store_labels(labelled_blobs, idx, record["labelled_blobs"])
+            labelled_candidates = _store_labels(labelled_candidates, idx, record["labelled_candidates"])
+            cloud_bands_map = _store_labels(cloud_bands_map, idx, record["cloud_bands_map"])
+            list_of_candidates.append(record["candidates"])
+            list_of_cloud_bands.append(record["cloud_bands"])
     #
     logger.info("Cloud band detection done")
     return fill_binarize_data, dilation, labelled_blobs, labelled_candidates, cloud_bands_map, list_of_candidates, list_of_cloud_bands
 
 
+def label_dtype(max_label: int) -> np.dtype:
+    """Narrowest unsigned integer dtype holding labels up to max_label"""
+    return np.min_scalar_type(max(int(max_label), 0))
+
+
+def _store_labels(labels_array: np.ndarray, idx: int, labels: np.ndarray) -> np.ndarray:
+    """
+    Store the labels of one time in the array of labels over time.
+    The array is widened (copied) if its dtype cannot hold the labels. Returns the array of labels
+    """
+    dtype = label_dtype(labels.max(initial=0))
+    if not np.can_cast(dtype, labels_array.dtype):
+        labels_array = labels_array.astype(np.promote_types(labels_array.dtype, dtype))
+    labels_array[idx] = labels
+    return labels_array
+
+
+def iter_detection_workflow(
+    var2process,
+    parameters: dict,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    resolution: np.ndarray,
+    listofdates,
+    config: dict,
+    keep_intermediates: bool = False,
+    histogram_accumulator: dict = None,
+    workers: int = 1,
+):
+    """
+    Streaming version of the detection workflow: cloud bands are detected one time after the other and
+    a record is yielded for each time. No array covering the whole period is allocated.
+    Args:
+        - var2process: variable that will be used for detection: an array with a time dimension first
+            or any iterable of 2D arrays (one per date of listofdates)
+        - parameters, latitudes, longitudes, resolution, listofdates, config: see detection_workflow
+        - keep_intermediates: if True, the binarized data, dilation, labelled blobs and candidates, the list of candidates
+            and the map of cloud bands are also put in the records (eg. for figures)
+        - histogram_accumulator: accumulator of the histograms of the frames (see olr_histogram). It is created if the
+            thresholding method is a running climatological threshold ("yen_climatology" or "otsu_climatology")
+        - workers: number of processes among which the times are spread. Chunks of DETECTION_CHUNK_SIZE frames are
+            copied into shared memory as they are read, and at most 2 chunks per process are pending, so that memory
+            does not grow with the period. Detection is serial when histograms are accumulated
+    Yields
+        - record (dict) with the index and date of the time, the list of cloud bands ('cloud_bands') and
+            the statistics of all candidates as lightweight records ('candidates_geometry', dictionary of arrays with
+            an 'iscloudband' column, see compute_candidates_geometry),
+            plus 'fill_binarize_data', 'dilation', 'labelled_blobs', 'labelled_candidates', 'candidates' and
+            'cloud_bands_map' if keep_intermediates
+    """
+    logger = logging.getLogger("cb_detection.iter_detection_workflow")
+    connectlongitudes = is_hemispheric_domain(config)
+    if histogram_accumulator is None and str(parameters["thresholding_method"]).lower().endswith("_climatology"):
+        histogram_accumulator = make_histogram_accumulator()
+    settings = (parameters, latitudes, longitudes, resolution, connectlongitudes)
+    if workers > 1 and histogram_accumulator is None:
+        logger.info(f"Detection spread over {workers} processes")
+        detections = _iter_parallel_detection(var2process, listofdates, settings, keep_intermediates, workers)
+    else:
+        # The running climatological threshold and the accumulation of histograms need the times in order
+        detections = (
+            _detection_one_time(
+                variable,
+                itime,
+                *settings,
+                keep_candidates=keep_intermediates,
+                histogram_accumulator=histogram_accumulator,
+            )
+            for itime, variable in zip(listofdates, var2process)
+        )
+    for idx, (itime, detection) in enumerate(zip(listofdates, detections)):
+        (
+            fill_binarize_data,
+            dilation,
+            labelled_blobs,
+            labelled_candidates,
+            candidates_geometry,
+            candidates,
+            cloud_bands,
+        ) = detection
+        record = {"index": idx, "date": itime, "cloud_bands": cloud_bands, "candidates_geometry": candidates_geometry}
+        if keep_intermediates:
+            record.update(
+                {
+                    "fill_binarize_data": fill_binarize_data,
+                    "dilation": dilation,
+                    "labelled_blobs": labelled_blobs,
+                    "labelled_candidates": labelled_candidates,
+                    "candidates": candidates,
+                    "cloud_bands_map": make_cloud_bands_map(cloud_bands, labelled_blobs.shape),
+                }
+            )
+        yield record
+
+
+def _iter_parallel_detection(var2process, listofdates, settings: tuple, keep_intermediates: bool, workers: int):
+    """
+    Detection of chunks of frames in a pool of processes, while the frames are read.
+    Frames are copied into blocks of shared memory (one per pending chunk, reused) so that they are not pickled
+    for each task: only the names of the blocks and the dates are sent to the processes.
+    Yields the outputs of _detection_one_time in date order
+    """
+    frames = zip(listofdates, var2process)
+    pending = deque()
+    free_blocks = []
+    shared_memories = []
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_streaming_worker, initargs=(settings,)
+        ) as executor:
+            while True:
+                chunk = list(islice(frames, DETECTION_CHUNK_SIZE))
+                if chunk:
+                    first_frame = np.asarray(chunk[0][1])
+                    if not shared_memories:
+                        # At most 2 chunks per process are pending, each one in its block
+                        for _ in range(2 * workers):
+                            shm = shared_memory.SharedMemory(
+                                create=True, size=max(DETECTION_CHUNK_SIZE * first_frame.nbytes, 1)
+                            )
+                            shared_memories.append(shm)
+                            free_blocks.append(shm)
+                    shm = free_blocks.pop()
+                    block = np.ndarray((len(chunk),) + first_frame.shape, dtype=first_frame.dtype, buffer=shm.buf)
+                    for iframe, (_, variable) in enumerate(chunk):
+                        block[iframe] = variable
+                    del block
+                    dates = [itime for itime, _ in chunk]
+                    task = (shm.name, (len(chunk),) + first_frame.shape, first_frame.dtype.str, dates)
+                    pending.append((shm, executor.submit(_streaming_detection_worker, task, keep_intermediates)))
+                # Results are yielded in order, once enough chunks are pending. The block of a chunk is reused
+                # once its results are back
+                while pending and (not chunk or len(pending) >= 2 * workers):
+                    shm, future = pending.popleft()
+                    results = future.result()
+                    free_blocks.append(shm)
+                    yield from results
+                if not chunk:
+                    break
+    finally:
+        for shm in shared_memories:
+            shm.close()
+            shm.unlink()
+
+
+def _init_streaming_worker(settings: tuple):
+    """Detection settings in each process of the pool"""
+    _worker_arrays["settings"] = settings
+
+
+def _streaming_detection_worker(task: tuple, keep_intermediates: bool) -> list:
+    """
+    Detection of a chunk of frames, read from a block of shared memory, in a process of the pool.
+    Intermediate arrays are only sent back if kept
+    """
+    shm_name, shape, dtype, dates = task
+    if shm_name not in _worker_arrays:
+        # blocks are attached once per process, they are reused for the next chunks
+        _worker_arrays[shm_name] = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=dtype, buffer=_worker_arrays[shm_name].buf)
+    results = []
+    for itime, variable in zip(dates, block):
+        detection = _detection_one_time(
+            variable, itime, *_worker_arrays["settings"], keep_candidates=keep_intermediates
+        )
+        results.append(detection if keep_intermediates else (None,) * 4 + detection[4:])
+    return results
+
+
+def is_hemispheric_domain(config: dict) -> bool:
+    """
+    If hemispheric detection (0-360°), first and last longitudes must be connected
+    """
+    logger = logging.getLogger("cb_detection.is_hemispheric_domain")
+    if abs(config["lon_east"] - config["lon_west"]) == 360:
+        logger.info("Blobs that are longitudinally crossing the map will be connected")
+        return True
+    return False
+
+
+def make_cloud_bands_map(cloud_bands: list, shape: tuple) -> np.ndarray:
+    """
+    Map of the cloud bands of one time: the value of each grid point of a cloud band is the index of the cloud band
+    in the list + 1, 0 elsewhere. The id of the cloud bands can be retrieved with make_cloud_bands_ids_table
+    """
+    cloud_bands_map = np.zeros(shape, dtype=label_dtype(len(cloud_bands)))
+    for icb, iblob in enumerate(cloud_bands, start=1):
+        cloud_bands_map[iblob.bbox][iblob.mask != 0] = icb
+    return cloud_bands_map
+
+
+def make_cloud_bands_ids_table(list_of_cloud_bands: list) -> np.ndarray:
+    """
+    Lookup table from the maps of cloud bands (indices, see make_cloud_bands_map) to the ids of the cloud bands:
+    ids_table[time, index] is the id of the cloud band, 0 for index 0 (no cloud band)
+    """
+    max_number_of_cloud_bands = max([len(el) for el in list_of_cloud_bands], default=0)
+    ids_table = np.zeros((len(list_of_cloud_bands), max_number_of_cloud_bands + 1), dtype=np.uint64)
+    for idx, cloud_bands in enumerate(list_of_cloud_bands):
+        ids_table[idx, 1 : len(cloud_bands) + 1] = [iblob.id_ for iblob in cloud_bands]
+    return ids_table
+
+
+def cloud_bands_map2ids(cloud_bands_map: np.ndarray, ids_table: np.ndarray) -> np.ndarray:
+    """
+    Transform maps of cloud bands over time (indices) into maps of cloud band ids (uint64)
+    """
+    indices = cloud_bands_map.reshape(len(cloud_bands_map), -1).astype(np.intp)
+    return np.take_along_axis(ids_table, indices, axis=1).reshape(cloud_bands_map.shape)
+
+
+def _detection_one_time(
+    variable: np.ndarray,
+    itime,
+    parameters: dict,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    resolution: np.ndarray,
+    connectlongitudes: bool,
+    keep_candidates: bool = True,
+    histogram_accumulator: dict = None,
+) -> tuple:
+    """
+    Detection of the cloud bands for one time: blob detection, selection of the cloud bands from the statistics
+    of the candidates, and objectification of the cloud bands.
+    The candidates that are not cloud bands are only objectified if 'keep_candidates' (otherwise, candidates is None).
+    'candidates_geometry' holds the statistics of all candidates, with an 'iscloudband' column
+    """
+    fill_binarize_data, dilation, labelled_blobs, labelled_candidates, candidates_stats = blob_detection(
+        variable, parameters, resolution, connectlongitudes, return_stats=True, histogram_accumulator=histogram_accumulator
+    )
+    candidates_geometry = compute_candidates_geometry(candidates_stats, longitudes, latitudes)
+    # Filtering out the cloud bands according the angle and "crossing the tropical line" criterion
+    iscloudband = select_cloudbands_from_statistics(candidates_geometry, parameters)
+    candidates_geometry["iscloudband"] = iscloudband
+    # Objectify the cloud bands only
+    cloud_bands = candidates2class(
+        labelled_candidates,
+        date=itime,
+        resolution=resolution,
+        lons=longitudes,
+        lats=latitudes,
+        candidates_stats={key: value[iscloudband] for key, value in candidates_geometry.items()},
+    )
+    for iblob in cloud_bands:
+        iblob.iscloudband = True
+    candidates = None
+    if keep_candidates:
+        rejected_candidates = candidates2class(
+            labelled_candidates,
+            date=itime,
+            resolution=resolution,
+            lons=longitudes,
+            lats=latitudes,
+            candidates_stats={key: value[~iscloudband] for key, value in candidates_geometry.items()},
+        )
+        # candidates sorted by label, cloud bands being the same objects in both lists
+        labels = np.concatenate((candidates_geometry["label"][iscloudband], candidates_geometry["label"][~iscloudband]))
+        unsorted_candidates = cloud_bands + rejected_candidates
+        candidates = [unsorted_candidates[icandidate] for icandidate in np.argsort(labels, kind="stable")]
+    return (
+        fill_binarize_data,
+        dilation,
+        labelled_blobs,
+        labelled_candidates,
+        candidates_geometry,
+        candidates,
+        cloud_bands,
+    )
+
+
+# Arrays shared with the detection processes, set by _init_detection_worker
+_worker_arrays = {}
+
+
+def _parallel_detection(
+    var2process: np.ndarray,
+    intermediate_arrays: tuple,
+    parameters: dict,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    resolution: np.ndarray,
+    listofdates,
+    connectlongitudes: bool,
+    workers: int,
+) -> tuple:
+    """
+    Spread the detection of the timesteps over a pool of processes.
+    The input variable and the intermediate arrays (binarized data, dilation, labelled blobs and candidates) are put
+    in shared memory so that they are not pickled for each task: processes read and write them directly.
+    Timesteps are processed in contiguous chunks, and results are gathered in date order
+    """
+    shared_memories = {}
+    try:
+        names = ("var2process", "fill_binarize_data", "dilation", "labelled_blobs", "labelled_candidates")
+        for name, array in zip(names, (var2process,) + tuple(intermediate_arrays)):
+            shared_memories[name] = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=shared_memories[name].buf)[...] = array
+        arrays_specs = {
+            name: (shared_memories[name].name, array.shape, array.dtype.str)
+            for name, array in zip(names, (var2process,) + tuple(intermediate_arrays))
+        }
+        nchunks = min(len(listofdates), workers * 4)
+        chunks = [chunk for chunk in np.array_split(np.arange(len(listofdates)), nchunks) if chunk.size]
+        tasks = [(chunk[0], chunk[-1] + 1, [listofdates[idx] for idx in chunk]) for chunk in chunks]
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_detection_worker,
+            initargs=(arrays_specs, parameters, latitudes, longitudes, resolution, connectlongitudes),
+        ) as executor:
+            results = list(executor.map(_detection_worker, tasks))
+        # Copy back the arrays processed in shared memory (the input variable is sanitized by the blob detection)
+        for name, array in zip(names, (var2process,) + tuple(intermediate_arrays)):
+            array[...] = np.ndarray(array.shape, dtype=array.dtype, buffer=shared_memories[name].buf)
+    finally:
+        for shm in shared_memories.values():
+            shm.close()
+            shm.unlink()
+    list_of_candidates = [candidates for chunk in results for candidates, _ in chunk]
+    list_of_cloud_bands = [cloud_bands for chunk in results for _, cloud_bands in chunk]
+    return list_of_candidates, list_of_cloud_bands
+
+
+def _init_detection_worker(arrays_specs, parameters, latitudes, longitudes, resolution, connectlongitudes):
+    """Attach the shared arrays and the detection settings in each process of the pool"""
+    for name, (shm_name, shape, dtype) in arrays_specs.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _worker_arrays[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+    _worker_arrays["settings"] = (parameters, latitudes, longitudes, resolution, connectlongitudes)
+
+
+def _detection_worker(task: tuple) -> list:
+    """Detection of a contiguous chunk of timesteps in a process of the pool"""
+    id_start, id_end, dates = task
+    parameters, latitudes, longitudes, resolution, connectlongitudes = _worker_arrays["settings"]
+    var2process = _worker_arrays["var2process"][1]
+    results = []
+    for idx, itime in zip(range(id_start, id_end), dates):
+        (
+            _worker_arrays["fill_binarize_data"][1][idx],
+            _worker_arrays["dilation"][1][idx],
+            _worker_arrays["labelled_blobs"][1][idx],
+            _worker_arrays["labelled_candidates"][1][idx],
+            _,
+            candidates,
+            cloud_bands,
+        ) = _detection_one_time(
+            var2process[idx], itime, parameters, latitudes, longitudes, resolution, connectlongitudes
+        )
+        results.append((candidates, cloud_bands))
+    return results
+
+
 def compute_blob_area(img: np.ndarray, idx: int, resolution: np.ndarray) -> float:
     """
     Compute the area of a given blob (based on the index of that blob) in an image
@@ -267,6 +761,94 @@ def compute_blob_area(img: np.ndarray, idx: int, resolution: np.ndarray) -> floa
     return blob_area
 
 
+def compute_blob_statistics(labelled_blobs: np.ndarray, resolution: np.ndarray) -> dict:
+    """
+    Compute the statistics of all the blobs of a labelled image in one pass
+    Input:
+        - labelled_blobs: 2D map of labels (0 = background), latitudes along the first dimension
+        - resolution: area of a grid point for each latitude (see misc.compute_resolution)
+    Output:
+        - dictionary of arrays indexed by label (row 0 = background):
+            label, npixels, area, row_min, row_max, col_min, col_max (bounding box, inclusive),
+            row_centroid, col_centroid, mu20, mu11, mu02 (central moments) and orientation (as in skimage.measure.regionprops)
+    """
+    nlabels = int(labelled_blobs.max()) + 1 if labelled_blobs.size else 1
+    ncols = labelled_blobs.shape[1]
+    # only pixels belonging to a blob are considered
+    pixels = np.flatnonzero(labelled_blobs)
+    labels = labelled_blobs.ravel()[pixels].astype(np.intp)
+    rows, cols = np.divmod(pixels, ncols)
+    npixels = np.bincount(labels, minlength=nlabels)
+    area = np.bincount(labels, weights=resolution[rows], minlength=nlabels)
+    # raw moments
+    m10 = np.bincount(labels, weights=rows, minlength=nlabels)
+    m01 = np.bincount(labels, weights=cols, minlength=nlabels)
+    m20 = np.bincount(labels, weights=rows * rows, minlength=nlabels)
+    m11 = np.bincount(labels, weights=rows * cols, minlength=nlabels)
+    m02 = np.bincount(labels, weights=cols * cols, minlength=nlabels)
+    # bounding boxes (slices are None for missing labels)
+    row_min = np.zeros(nlabels, dtype=np.intp)
+    row_max = np.full(nlabels, -1, dtype=np.intp)
+    col_min = np.zeros(nlabels, dtype=np.intp)
+    col_max = np.full(nlabels, -1, dtype=np.intp)
+    for ilabel, bbox in enumerate(ndi.find_objects(labelled_blobs), start=1):
+        if bbox is not None:
+            row_min[ilabel], row_max[ilabel] = bbox[0].start, bbox[0].stop - 1
+            col_min[ilabel], col_max[ilabel] = bbox[1].start, bbox[1].stop - 1
+    return blob_statistics_from_sums(
+        np.arange(nlabels), npixels, area, m10, m01, m20, m11, m02, row_min, row_max, col_min, col_max
+    )
+
+
+def blob_statistics_from_sums(
+    label: np.ndarray,
+    npixels: np.ndarray,
+    area: np.ndarray,
+    m10: np.ndarray,
+    m01: np.ndarray,
+    m20: np.ndarray,
+    m11: np.ndarray,
+    m02: np.ndarray,
+    row_min: np.ndarray,
+    row_max: np.ndarray,
+    col_min: np.ndarray,
+    col_max: np.ndarray,
+) -> dict:
+    """
+    Table of statistics of blobs (see compute_blob_statistics) from the sums over their pixels:
+    number of pixels, area, raw moments (m10 = sum of rows, m01 = sum of columns, m20 = sum of squared rows, ...)
+    and bounding boxes. Sums of merged blobs are the sums of the sums of the blobs
+    """
+    # centroids and central moments (0 for labels without any pixel)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        row_centroid = np.where(npixels > 0, m10 / npixels, 0.0)
+        col_centroid = np.where(npixels > 0, m01 / npixels, 0.0)
+        mu20 = np.where(npixels > 0, m20 - m10 * row_centroid, 0.0)
+        mu11 = np.where(npixels > 0, m11 - m10 * col_centroid, 0.0)
+        mu02 = np.where(npixels > 0, m02 - m01 * col_centroid, 0.0)
+        # orientation of the ellipse: angle between the row axis and the major axis (skimage.measure.regionprops convention)
+        a, b, c = mu02 / npixels, -mu11 / npixels, mu20 / npixels
+        orientation = np.where(
+            a - c == 0, np.where(b < 0, np.pi / 4.0, -np.pi / 4.0), 0.5 * np.arctan2(-2 * b, c - a)
+        )
+    orientation[npixels == 0] = 0.0
+    return {
+        "label": label,
+        "npixels": npixels,
+        "area": area,
+        "row_min": row_min,
+        "row_max": row_max,
+        "col_min": col_min,
+        "col_max": col_max,
+        "row_centroid": row_centroid,
+        "col_centroid": col_centroid,
+        "mu20": mu20,
+        "mu11": mu11,
+        "mu02": mu02,
+        "orientation": orientation,
+    }
+
+
 def get_cloudband_latlon(cloudband: np.ndarray, lons: np.ndarray, lats: np.ndarray):
     """
     Make maps of the cloud band's longitudes and latitudes
@@ -281,33 +863,61 @@ def get_cloudband_latlon(cloudband: np.ndarray, lons: np.ndarray, lats: np.ndarr
     return cloud_lonmap, cloud_latmap
 
 
+def label_with_periodic_longitudes(binary_image: np.ndarray, connectivity: int = 2) -> np.ndarray:
+    """
+    Connected components labelling for hemispheric domains (0-360°), where the first and last longitudes are neighbours.
+    Blobs are labelled on the map, then the labels touching each other through the longitudinal edges are merged
+    """
+    labelled_blobs = measure.label(binary_image, connectivity=connectivity, background=0)
+    return connectLongitudes(labelled_blobs)
+
+
 def reNumberLabels(labels):
     """
     Make sure all label values in a label image are sequential with no gaps
     """
-    res = np.array(labels)  # copy to avoid side effects
-    labelMap = []
-    nextlabel = 1
-    for i in range(1, np.max(res) + 1):
-        if np.sum(res == i):  # if label i is used
-            labelMap.append((i, nextlabel))
-            nextlabel += 1
-    for old, new in labelMap:
-        res[res == old] = new
-    return res
+    res = np.asarray(labels)
+    return _renumbering_table(res)[res]
 
 
 def connectLongitudes(labels, nolabel=0):
     """
-    Merge labels that connects through the boundaries of the image, vertically and horizontally
-    """
-    # make a copy to work on, to avoid side effects on the original label array
-    res = np.array(labels)
-    # connect horizontally
-    for i in range(0, res.shape[0]):
-        # if the first pixel of the line is not null and the last one is also not null but different, we merge them
-        # we use the minimum label of both to make sure we don't miss concave regions
-        if res[i, 0] != nolabel and res[i, -1] != nolabel and res[i, -1] != res[i, 0]:
-            lMin, lMax = min(res[i, 0], res[i, -1]), max(res[i, 0], res[i, -1])
-            res[res == lMax] = lMin
-    return reNumberLabels(res)
+    Merge labels that connects through the boundaries of the image, horizontally.
+    The labels facing each other on the first and last columns are merged with a union-find (the minimum label of each group is kept,
+    to make sure we don't miss concave regions), then labels are made sequential with one pass of a lookup table over the image.
+    """
+    res = np.asarray(labels)
+    nlabels = int(res.max()) + 1
+    # union-find: parent of each label
+    parent = np.arange(nlabels)
+
+    def find(label):
+        while parent[label] != label:
+            parent[label] = parent[parent[label]]
+            label = parent[label]
+        return label
+
+    first_column, last_column = res[:, 0], res[:, -1]
+    onseam = (first_column != nolabel) & (last_column != nolabel) & (first_column != last_column)
+    for label1, label2 in set(zip(first_column[onseam].tolist(), last_column[onseam].tolist())):
+        root1, root2 = find(label1), find(label2)
+        if root1 != root2:
+            parent[max(root1, root2)] = min(root1, root2)
+    # flatten the trees so that each label points to the root of its group
+    roots = parent
+    while np.any(roots[roots] != roots):
+        roots = roots[roots]
+    # label -> root -> sequential label
+    lookup_table = _renumbering_table(roots[res])[roots]
+    return lookup_table[res]
+
+
+def _renumbering_table(labels: np.ndarray) -> np.ndarray:
+    """
+    Lookup table making the labels used in 'labels' sequential (1, 2, ...). 0 (background) stays 0
+    """
+    used = np.bincount(labels.ravel(), minlength=1) > 0
+    used[0] = False
+    lookup_table = np.zeros(used.size, dtype=labels.dtype)
+    lookup_table[used] = np.arange(1, np.count_nonzero(used) + 1)
+    return lookup_table
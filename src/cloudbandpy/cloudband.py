@@ -4,11 +4,40 @@
 import numpy as np
 import pickle
 
+# The id of a cloud band is its date (YYYYMMDDhhmmss) times ID_DATE_FACTOR plus its index among the candidates of the date
+ID_DATE_FACTOR = 10**5
+
+
+def make_cloud_band_id(date, index):
+    """Id of the cloud band of index 'index' among the candidates of the date 'date' (integer YYYYMMDDhhmmss)"""
+    return date * ID_DATE_FACTOR + index
+
+
+def decode_cloud_band_id(id_) -> tuple:
+    """
+    Date (integer YYYYMMDDhhmmss) and index among the candidates of the date of cloud band ids (integer or array)
+    """
+    return id_ // ID_DATE_FACTOR, id_ % ID_DATE_FACTOR
+
 
 class CloudBand(object):
     """Class defining a cloud band
     It sets the label of the cloud band according to the date and computes its orientation.
-    Input: an array containing one cloud band, a map of its longitudes and latitudes, the date"""
+    Input: an array containing one cloud band, a map of its longitudes and latitudes, the date
+
+    The cloud band is stored in a compact way: the mask of the cloud band cropped to its bounding box,
+    the offset of the bounding box in the domain, the latitudes (longitudes) of the rows (columns) of the bounding box
+    and the latitudinal/longitudinal extents as scalars.
+    The full-domain arrays (cloud_band_array, lats, lons) are only built when they are asked for.
+    If 'offset' is None, the inputs are full-domain arrays (cloud band array and maps of latitudes and longitudes)
+    and they are cropped. Otherwise, 'cloud_band_array' is the cropped mask, 'lats' and 'lons' the coordinates of the rows
+    and columns of the bounding box, 'offset' the position of the bounding box in the domain of shape 'domain_shape'.
+    The cropped mask can also be given as a function returning it: it is then only decoded when it is first used
+    (eg. cloud bands of a catalogue whose masks are loaded on demand).
+
+    'index' is the index of the cloud band among the candidates of its date: the id of the cloud band is built from
+    the date and this index (see make_cloud_band_id), so that ids are unique. Without index (cloud bands saved before),
+    the id is built from the date and the longitude of the centroid."""
 
     def __init__(
         self,
@@ -23,8 +52,20 @@ class CloudBand(object):
         iscloudband: bool = True,
         connected_longitudes: bool = False,
         parents: set[str] = set(),
+        lat_min: float = None,
+        lat_max: float = None,
+        offset: tuple = None,
+        domain_shape: tuple = None,
+        index: int = None,
     ):
-        self.cloud_band_array = cloud_band_array
+        if offset is None:
+            self._set_from_full_arrays(cloud_band_array, lats, lons)
+        else:
+            self.mask = cloud_band_array if callable(cloud_band_array) else np.asarray(cloud_band_array, dtype=np.uint8)
+            self.offset = tuple(int(el) for el in offset)
+            self.domain_shape = tuple(int(el) for el in domain_shape)
+            self.bbox_lats = np.asarray(lats)
+            self.bbox_lons = np.asarray(lons)
         self.date = date
         self.area = area
         self.angle = angle
@@ -32,16 +73,78 @@ class CloudBand(object):
         self.lat_centroid = lat_centroid
         # Label/id of the cloud band
         self.parents = parents
-        # id = "date _ longitude (location)"
-        # self.id_ = int(f"{self.date}_{round(self.lon_centroid)}")
-        self.id_ = int(f"{self.date}{round(self.lon_centroid % 360):03d}")
+        self.index = index
+        if index is not None:
+            self.id_ = make_cloud_band_id(int(self.date), int(index))
+        else:
+            # id = "date _ longitude (location)"
+            self.id_ = int(f"{self.date}{round(self.lon_centroid % 360):03d}")
         #
-        self.lats = lats
-        self.lons = lons
         self.iscloudband = iscloudband
         # If the cloud band crosses the edges of the (worldwide) domain,
         # the longitudes on the longitudinal edges are connected
         self.connected_longitudes = connected_longitudes
+        # Latitudinal and longitudinal extents of the cloud band
+        self.lat_min = lat_min if lat_min is not None else _nanmin(self.bbox_lats)
+        self.lat_max = lat_max if lat_max is not None else _nanmax(self.bbox_lats)
+        self.lon_min = _nanmin(self.bbox_lons)
+        self.lon_max = _nanmax(self.bbox_lons)
+
+    def _set_from_full_arrays(self, cloud_band_array: np.ndarray, lats: np.ndarray, lons: np.ndarray):
+        """Crop the full-domain cloud band array and maps of latitudes and longitudes to the bounding box of the cloud band"""
+        cloud_band_array = np.asarray(cloud_band_array)
+        self.domain_shape = cloud_band_array.shape
+        rows, cols = np.nonzero(cloud_band_array)
+        if rows.size:
+            bbox = (slice(rows.min(), rows.max() + 1), slice(cols.min(), cols.max() + 1))
+        else:
+            bbox = (slice(0, 0), slice(0, 0))
+        self.mask = (cloud_band_array[bbox] != 0).astype(np.uint8)
+        self.offset = (bbox[0].start, bbox[1].start)
+        # Maps of latitudes and longitudes are NaN outside the cloud band
+        self.bbox_lats = np.fmax.reduce(np.asarray(lats)[bbox], axis=1) if rows.size else np.array([])
+        self.bbox_lons = np.fmax.reduce(np.asarray(lons)[bbox], axis=0) if rows.size else np.array([])
+
+    @property
+    def mask(self) -> np.ndarray:
+        """Mask of the cloud band cropped to its bounding box"""
+        if callable(self._mask):
+            self._mask = np.asarray(self._mask(), dtype=np.uint8)
+        return self._mask
+
+    @mask.setter
+    def mask(self, mask):
+        self._mask = mask
+
+    @property
+    def bbox(self) -> tuple:
+        """Slices of the bounding box of the cloud band in the domain (the mask is not needed)"""
+        return (
+            slice(self.offset[0], self.offset[0] + len(self.bbox_lats)),
+            slice(self.offset[1], self.offset[1] + len(self.bbox_lons)),
+        )
+
+    @property
+    def cloud_band_array(self) -> np.ndarray:
+        """Full-domain array of the cloud band: 1 for the cloud band, 0 elsewhere"""
+        cloud_band_array = np.zeros(self.domain_shape, dtype=np.uint8)
+        cloud_band_array[self.bbox] = self.mask
+        return cloud_band_array
+
+    @property
+    def lats(self) -> np.ndarray:
+        """Full-domain map of the latitudes of the cloud band, NaN outside the cloud band"""
+        return self._coordinates_map(np.broadcast_to(self.bbox_lats[:, None], self.mask.shape))
+
+    @property
+    def lons(self) -> np.ndarray:
+        """Full-domain map of the longitudes of the cloud band, NaN outside the cloud band"""
+        return self._coordinates_map(np.broadcast_to(self.bbox_lons[None, :], self.mask.shape))
+
+    def _coordinates_map(self, bbox_coordinates: np.ndarray) -> np.ndarray:
+        coordinates_map = np.full(self.domain_shape, np.nan, dtype=np.result_type(bbox_coordinates.dtype, np.float16))
+        coordinates_map[self.bbox] = np.where(self.mask != 0, bbox_coordinates, np.nan)
+        return coordinates_map
 
     @classmethod
     def fromfile(cls, filename):
@@ -52,25 +155,13 @@ class CloudBand(object):
             filename: File name (str)
         """
         with open(filename, "rb") as f:
-            data = pickle.load(f)
-            return cls(
-                data["cloud_band_array"],
-                data["date"],
-                data["area"],
-                data["lats"],
-                data["lons"],
-                data["angle"],
-                data["lon_centroid"],
-                data["lat_centroid"],
-                data["iscloudband"],
-                data["connected_longitudes"],
-                data["parents"],
-            )
+            return cls.fromdict(pickle.load(f))
 
     @classmethod
     def fromdict(cls, d):
         """
         Alternative construction loading the data from a dictionary
+        Dictionaries holding full-domain arrays (no 'offset' key) are also handled
 
         Input:
             d: dictionary (dict)
@@ -87,6 +178,9 @@ class CloudBand(object):
             d["iscloudband"],
             d["connected_longitudes"],
             d["parents"],
+            offset=d.get("offset"),
+            domain_shape=d.get("domain_shape"),
+            index=d.get("index"),
         )
 
     def tofile(self, filename):
@@ -97,44 +191,71 @@ class CloudBand(object):
             filename: Output file name (str)
         """
         with open(filename, "wb") as f:
-             pickle.dump(
-                {
-                    "cloud_band_array": self.cloud_band_array,
-                    "date": self.date,
-                    "area": self.area,
-                    "lats": self.lats,
-                    "lons": self.lons,
-                    "angle": self.angle,
-                    "lon_centroid": self.lon_centroid,
-                    "lat_centroid": self.lat_centroid,
-                    "iscloudband": self.iscloudband,
-                    "connected_longitudes": self.connected_longitudes,
-                    "parents": self.parents,
-                },
-                f,
-            )
+            pickle.dump(self.todict(), f)
 
     def todict(self):
         """
         Dumps the data to a dictionary structure
+        The cloud band array is the mask cropped to the bounding box, and lats/lons are the coordinates of the bounding box
 
         Returns: dictionary
         """
         return {
-            "cloud_band_array": self.cloud_band_array,
+            "cloud_band_array": self.mask,
+            "offset": self.offset,
+            "domain_shape": self.domain_shape,
             "date": self.date,
             "area": self.area,
-            "lats": self.lats,
-            "lons": self.lons,
+            "lats": self.bbox_lats,
+            "lons": self.bbox_lons,
             "angle": self.angle,
             "lon_centroid": self.lon_centroid,
             "lat_centroid": self.lat_centroid,
             "iscloudband": self.iscloudband,
             "connected_longitudes": self.connected_longitudes,
             "parents": self.parents,
+            "index": self.index,
         }
 
 
+def cloud_bands_columns(list_of_cloud_bands: list) -> dict:
+    """
+    Attributes of a list of lists of cloud bands (1 list per time) as columns, one element per cloud band
+    (the masks are not included): time_index, date, id, index (-1 without index), flags, offset, shape of the mask,
+    shape of the domain, scalars (area, angle, centroids, extents), parents (ids) with the pointers parents_ptr
+    (parents of the cloud band i: parents[parents_ptr[i] : parents_ptr[i + 1]]), latitudes (longitudes) of the rows
+    (columns) of the bounding boxes one after the other, and the number of times (ntimes)
+    """
+    clouds = [cloud for clouds in list_of_cloud_bands for cloud in clouds]
+    columns = {
+        "ntimes": np.array(len(list_of_cloud_bands)),
+        "time_index": np.repeat(np.arange(len(list_of_cloud_bands), dtype=np.int32), [len(j) for j in list_of_cloud_bands]),
+        "date": np.array([cloud.date for cloud in clouds], dtype=np.int64),
+        "id": np.array([cloud.id_ for cloud in clouds], dtype=np.int64),
+        "index": np.array([-1 if cloud.index is None else cloud.index for cloud in clouds], dtype=np.int64),
+        "iscloudband": np.array([cloud.iscloudband for cloud in clouds], dtype=bool),
+        "connected_longitudes": np.array([cloud.connected_longitudes for cloud in clouds], dtype=bool),
+        "offset": np.array([cloud.offset for cloud in clouds], dtype=np.int32).reshape(-1, 2),
+        "mask_shape": np.array([(len(cloud.bbox_lats), len(cloud.bbox_lons)) for cloud in clouds], dtype=np.int32).reshape(-1, 2),
+        "domain_shape": np.array([cloud.domain_shape for cloud in clouds], dtype=np.int32).reshape(-1, 2),
+        "parents_ptr": np.cumsum([0] + [len(cloud.parents) for cloud in clouds], dtype=np.int64),
+        "parents": np.array([parent for cloud in clouds for parent in sorted(cloud.parents)], dtype=np.int64),
+        "bbox_lats": np.concatenate([cloud.bbox_lats for cloud in clouds]) if clouds else np.array([]),
+        "bbox_lons": np.concatenate([cloud.bbox_lons for cloud in clouds]) if clouds else np.array([]),
+    }
+    for key in ("area", "angle", "lon_centroid", "lat_centroid", "lat_min", "lat_max", "lon_min", "lon_max"):
+        columns[key] = np.array([getattr(cloud, key) for cloud in clouds], dtype=float)
+    return columns
+
+
+def _nanmin(array: np.ndarray) -> float:
+    return np.fmin.reduce(array) if np.size(array) else np.nan
+
+
+def _nanmax(array: np.ndarray) -> float:
+    return np.fmax.reduce(array) if np.size(array) else np.nan
+
+
 # def dump_list(l, filename):
 #     """
 #     Dumps a list of lists of instances of `CloudBand` into a pickle file,
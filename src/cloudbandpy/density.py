@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Density of cloud bands: number of times with a cloud band at each grid point.
+
+The counts are accumulated one time after the other, per month, in an accumulator (dictionary),
+from the cloud bands of the time or from maps of cloud bands (eg. read from the netCDF files of cloud bands).
+Accumulators of different periods, domains with the same grid or processes can be merged,
+so that climatologies are computed without keeping the cloud bands of the whole period in memory.
+"""
+
+import logging
+import netCDF4 as nc
+import numpy as np
+
+from .io_utilities import catalogue_masks_start, decode_catalogue_mask, load_catalogue_columns, load_catalogue_masks
+
+# Months of each season
+SEASONS = {"DJF": (12, 1, 2), "MAM": (3, 4, 5), "JJA": (6, 7, 8), "SON": (9, 10, 11)}
+
+
+def make_density_accumulator(shape: tuple) -> dict:
+    """
+    Empty accumulator of the density of cloud bands over a domain of shape 'shape' (latitudes, longitudes)
+    Returns dictionary with:
+        - counts: array (month, latitude, longitude), number of times with a cloud band per grid point
+        - nframes: number of times accumulated per month
+        - years: years of the times accumulated
+    """
+    return {
+        "counts": np.zeros((12,) + tuple(shape), dtype=np.int32),
+        "nframes": np.zeros(12, dtype=np.int64),
+        "years": set(),
+    }
+
+
+def add_cloud_bands_to_density(accumulator: dict, cloud_bands: list, date) -> dict:
+    """Add the cloud bands of one time (date) to the accumulator. Only the bounding boxes of the cloud bands are updated"""
+    counts = accumulator["counts"][date.month - 1]
+    for cloud_band in cloud_bands:
+        counts[cloud_band.bbox] += cloud_band.mask != 0
+    return _add_time(accumulator, date)
+
+
+def add_map_to_density(accumulator: dict, cloud_bands_map: np.ndarray, date) -> dict:
+    """Add the map of the cloud bands of one time (date) to the accumulator (grid points of cloud bands are not 0)"""
+    accumulator["counts"][date.month - 1] += np.asarray(cloud_bands_map) != 0
+    return _add_time(accumulator, date)
+
+
+def _add_time(accumulator: dict, date) -> dict:
+    accumulator["nframes"][date.month - 1] += 1
+    accumulator["years"].add(date.year)
+    return accumulator
+
+
+def add_netcdf_to_density(accumulator: dict, filename: str) -> dict:
+    """
+    Add the maps of cloud bands saved in a netCDF file (see io_utilities.write_cloud_bands_to_netcdf)
+    to the accumulator, one time after the other
+    """
+    logger = logging.getLogger("density.add_netcdf_to_density")
+    with nc.Dataset(filename, "r") as rootgrp:
+        time = rootgrp.variables["time"]
+        dates = nc.num2date(time[:], time.units)
+        cloud_band_mask = rootgrp.variables["cloud_band_mask"]
+        for itime, date in enumerate(dates):
+            add_map_to_density(accumulator, np.ma.filled(cloud_band_mask[itime], 0), date)
+    logger.info(f"{len(dates)} times of {filename} added to the density")
+    return accumulator
+
+
+def add_catalogue_to_density(accumulator: dict, filename: str, dates) -> dict:
+    """
+    Add the cloud bands of a columnar catalogue (see io_utilities.dump_catalogue) to the accumulator, one time after
+    the other. Only the positions and masks of the cloud bands are read, each mask is decoded when it is added
+    Args:
+        - filename: file of the catalogue
+        - dates: dates of the times of the catalogue
+    """
+    logger = logging.getLogger("density.add_catalogue_to_density")
+    columns = load_catalogue_columns(filename, ["ntimes", "time_index", "offset", "mask_shape"])
+    if len(dates) != int(columns["ntimes"]):
+        raise ValueError(f"{len(dates)} dates for the {int(columns['ntimes'])} times of {filename}")
+    packed_masks = load_catalogue_masks(filename)
+    masks_start = catalogue_masks_start(columns["mask_shape"])
+    months = np.array([date.month for date in dates])
+    for itime, (row, col), shape, start in zip(
+        columns["time_index"], columns["offset"], columns["mask_shape"], masks_start
+    ):
+        mask = decode_catalogue_mask(packed_masks, int(start), tuple(shape))
+        accumulator["counts"][months[itime] - 1, row : row + shape[0], col : col + shape[1]] += mask
+    for date in dates:
+        _add_time(accumulator, date)
+    logger.info(f"{len(dates)} times of {filename} added to the density")
+    return accumulator
+
+
+def merge_density_accumulators(*accumulators) -> dict:
+    """Merge accumulators of the same domain (eg. of different years or processes)"""
+    merged = make_density_accumulator(accumulators[0]["counts"].shape[1:])
+    for accumulator in accumulators:
+        merged["counts"] += accumulator["counts"]
+        merged["nframes"] += accumulator["nframes"]
+        merged["years"] |= accumulator["years"]
+    return merged
+
+
+def seasonal_counts(accumulator: dict) -> dict:
+    """
+    Counts of the accumulator per season (see SEASONS)
+    Returns dictionary, for each season, of the number of times with a cloud band per grid point and the number of times
+    """
+    return {
+        season: (
+            accumulator["counts"][[month - 1 for month in months]].sum(axis=0),
+            accumulator["nframes"][[month - 1 for month in months]].sum(),
+        )
+        for season, months in SEASONS.items()
+    }
+
+
+def total_counts(accumulator: dict) -> np.ndarray:
+    """Number of times with a cloud band per grid point over all the times accumulated"""
+    return accumulator["counts"].sum(axis=0)
@@ -7,17 +7,42 @@ and dataset, and to subset variables
 
 
 import datetime as dt
+from functools import partial
+import hashlib
+import json
 import logging
 import netCDF4 as nc
 import numpy as np
 import os
+import pandas as pd
 import pickle
 import yaml
 
-from .cloudband import CloudBand
+from .cb_detection import make_cloud_bands_map
+from .cloudband import CloudBand, cloud_bands_columns
 from .misc import is_decreasing, convert_olr_in_wm2, wrapTo180
 from .time_utilities import add_startend_datetime2config, convert_date2num, create_list_of_dates, create_array_of_times
 
+# Settings that determine the cloud band candidates: input data, preprocessing (configuration) and thresholds (parameters)
+CANDIDATES_CONFIG_KEYS = (
+    "startdate",
+    "enddate",
+    "domain",
+    "lon_west",
+    "lon_east",
+    "lat_north",
+    "lat_south",
+    "clouddata_path",
+    "varname_infilename",
+    "varname",
+    "qd_var",
+    "datatimeresolution",
+    "period_detection",
+    "olr_convert2wm2",
+    "select_djfm",
+)
+CANDIDATES_PARAMETERS_KEYS = ("OLR_THRESHOLD", "thresholding_method", "CLOUD_BAND_AREA_THRESHOLD")
+
 
 def logging_setup():
     FORMAT = "%(asctime)s - %(name)s - %(levelname)s: %(message)s"
@@ -47,9 +72,11 @@ def load_ymlfile(yml_file: str = None, isconfigfile: bool = False) -> dict:
     return config
 
 
-def openncfile(filename: str, config) -> tuple:
+def openncfile(filename: str, config, crop2domain: bool = True) -> tuple:
     """
     Open netcdf data and return time, lons, lats and variable.
+    If crop2domain, only the hyperslab of the domain of the config file is read from the file
+    (see get_domain_indices), otherwise the whole field is read.
     Note: netCDF4 file assumed to contain only one variable
     and to have a single level (ERA5 surface field)
     """
@@ -62,7 +89,15 @@ def openncfile(filename: str, config) -> tuple:
     olr_convert2wm2 = config["olr_convert2wm2"]
     if os.path.isdir(filedirectory) and os.path.isfile(filedirectory + "/" + filename):
         ds = nc.Dataset(filedirectory + "/" + filename, "r")
-        variable = ds.variables[varname][...]
+        lats = ds.variables[ycoord_name][...]
+        lons = ds.variables[xcoord_name][...]
+        if crop2domain:
+            lon_ids, lat_ids, lons, lats = get_domain_indices(
+                lons, lats, config["lon_west"], config["lon_east"], config["lat_north"], config["lat_south"]
+            )
+            variable = read_hyperslab(ds.variables[varname], index_runs(lat_ids), index_runs(lon_ids))
+        else:
+            variable = ds.variables[varname][...]
         # Convert into W.m^-2 if needed
         if olr_convert2wm2:
             variable = convert_olr_in_wm2(variable)
@@ -72,8 +107,7 @@ def openncfile(filename: str, config) -> tuple:
             calendar=ds.variables[timecoord_name].calendar,
             only_use_cftime_datetimes=False,
         )
-        lats = ds.variables[ycoord_name][...]
-        lons = ds.variables[xcoord_name][...]
+        ds.close()
         # Make that latitudes are decreasing (90° -> 0 -> -90°) and reshape variable accordingly
         if not is_decreasing(lats):
             logger.warning("latitudes are increasing. Must be decreasing. Reshapping latitudes and variable.")
@@ -84,6 +118,28 @@ def openncfile(filename: str, config) -> tuple:
         raise ValueError("Directory or file does not exist")
 
 
+def read_hyperslab(ncvariable, lat_runs: list, lon_runs: list) -> np.ndarray:
+    """
+    Read the blocks (time, lat_run, lon_run) of a netCDF variable (time, latitude, longitude)
+    and put them together
+    """
+    return np.ma.concatenate(
+        [np.ma.concatenate([ncvariable[:, lat_run, lon_run] for lon_run in lon_runs], axis=-1) for lat_run in lat_runs],
+        axis=-2,
+    )
+
+
+def index_runs(ids) -> list:
+    """Slices of the runs of consecutive indices of ids"""
+    ids = np.asarray(ids, dtype=int)
+    if ids.size == 0:
+        raise ValueError("No grid point of the data in the domain")
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    ends = np.concatenate((breaks, [ids.size]))
+    return [slice(int(ids[start]), int(ids[end - 1]) + 1) for start, end in zip(starts, ends)]
+
+
 def load_dataset(config: dict) -> tuple:
     """
     Load netCDF4 data and time. It considers that the filenames are formatted as 'varname_infilename_year.nc'
@@ -101,36 +157,40 @@ def load_dataset(config: dict) -> tuple:
     #
     datetime_startdate = config["datetime_startdate"]
     datetime_enddate = config["datetime_enddate"]
-    lat_north = config["lat_north"]
-    lat_south = config["lat_south"]
-    lon_west = config["lon_west"]
-    lon_east = config["lon_east"]
     #
     year_start = datetime_startdate.year
     year_end = datetime_enddate.year
+    # Time steps are averaged over the periods of detection as the yearly files are read
+    if config["qd_var"]:
+        logger.info("Computation of daily average")
+        listofdates = create_list_of_dates(config)
+    accumulator = None
     variable = []
-    timein = []
     for iyear in range(int(year_start), int(year_end) + 1):
         logger.info(f"Loading {iyear} --> {year_end}")
         # construct the filename
         filename = f"{varname_infilename}_{iyear}.nc"
-        # load a file per year
-        time_tmp, lons_in, lats_in, variable_tmp = openncfile(filename, config)
-        timein = np.append(timein, time_tmp, axis=0)
-        del time_tmp
-        variable.append(np.asarray(variable_tmp))
+        # load a file per year, only the domain is read from the file
+        time_tmp, lons, lats, variable_tmp = openncfile(filename, config)
+        variable_tmp = np.asarray(variable_tmp)
+        if config["qd_var"]:
+            if accumulator is None:
+                accumulator = make_periods_accumulator(len(listofdates), variable_tmp.shape[1:], variable_tmp.dtype)
+            add_to_periods_accumulator(accumulator, variable_tmp, np.asarray(time_tmp), listofdates, config)
+        else:
+            variable.append(variable_tmp)
+        del time_tmp, variable_tmp
     #
-    del variable_tmp
-    # Transform list of N arrays into an array with a time dimension equal to N
-    variable = np.vstack(variable)
-    variable4cb, lons, lats = get_variable_lonlat_from_domain(
-        variable, lons_in, lats_in, lon_west, lon_east, lat_north, lat_south
-    )
+    if config["qd_var"]:
+        variable4cb = periods_average(accumulator)
+        del accumulator
+        logger.info("Computation of daily average done")
+    else:
+        # Transform list of N arrays into an array with a time dimension equal to N
+        variable4cb = np.concatenate(variable, axis=0)
     del variable
-    # Create daily mean of the input variable?
+    # Save daily variable (and latitudes and longitudes)
     if config["qd_var"]:
-        variable4cb = make_daily_average(variable4cb, timein, config)
-        # Save daily variable (and latitudes and longitudes)
         if config["save_dailyvar"]:
             logger.info("Saving daily variable")
             npy_save_dailyvar(config, variable4cb)
@@ -155,29 +215,40 @@ def get_variable_lonlat_from_domain(
     Return: Cropped variable, longitudes and latitudes
     """
     logger = logging.getLogger("io_utilities.get_variable_lonlat_from_domain")
+    lon_ids, lat_ids, lons, lats = get_domain_indices(lons_in, lats_in, lon_west, lon_east, lat_north, lat_south)
+    variable = variable[..., lon_ids][..., lat_ids, :]
+    logger.info("Subsetting dataset on domain done")
+    return variable, lons, lats
+
+
+def get_domain_indices(
+    lons_in: np.ndarray,
+    lats_in: np.ndarray,
+    lon_west: int,
+    lon_east: int,
+    lat_north: int,
+    lat_south: int,
+) -> tuple:
+    """
+    Indices of the longitudes and latitudes of the domain, from the coordinates only
+    Return: indices of longitudes, indices of latitudes, longitudes and latitudes of the domain
+    """
+    logger = logging.getLogger("io_utilities.get_domain_indices")
     if lon_east < lon_west:
         logger.info("Domain is 'over' the map. Stitching one side to the other")
         # going over longitude 0° when the longitudes go from 0 to 360°
-        # Atlantic ocean, we need to cycle the data due to the domain crossing 0°.
-        lons_inwrap180 = wrapTo180(lons_in)
-        lons180 = np.concatenate(
-            (lons_inwrap180[len(lons_inwrap180) // 2 :], lons_inwrap180[: len(lons_inwrap180) // 2])
-        )
-        variable = np.dstack((variable[..., len(lons_in) // 2 :], variable[..., : len(lons_in) // 2]))
-        indice_west = [idx for idx, el in enumerate(lons180) if el == wrapTo180(lon_west)][0]
-        indice_east = [idx for idx, el in enumerate(lons180) if el == wrapTo180(lon_east)][0]
+        # Atlantic ocean, we need to cycle the longitudes due to the domain crossing 0°.
+        nlons = len(lons_in)
+        lons180 = np.roll(wrapTo180(lons_in), -(nlons // 2))
+        indice_west = np.where(lons180 == wrapTo180(lon_west))[0][0]
+        indice_east = np.where(lons180 == wrapTo180(lon_east))[0][0]
+        # indices in the cycled longitudes -> indices in the input longitudes
+        lon_ids = (np.arange(indice_west, indice_east) + nlons // 2) % nlons
         lons = lons180[indice_west:indice_east]
-        variable_lon = variable[
-            ..., np.where(lons180 == wrapTo180(lon_west))[0][0] : np.where(lons180 == wrapTo180(lon_east))[0][0]
-        ]
     else:
         lon_ids, lons = subset_longitudes(lons_in, lon_west, lon_east)
-        variable_lon = variable[..., lon_ids]
     lat_ids, lats = subset_latitudes(lats_in, lat_north, lat_south)
-    #
-    variable = variable_lon[..., lat_ids, :]
-    logger.info("Subsetting dataset on domain done")
-    return variable, lons, lats
+    return lon_ids, lat_ids, lons, lats
 
 
 def subset_longitudes(lons_in: np.ndarray, lon_west: float, lon_east: float) -> np.ndarray:
@@ -191,44 +262,86 @@ def subset_latitudes(lats_in: np.ndarray, lat_north: float, lat_south: float) ->
 
 
 def get_ids_start_end4timecrop(itime, config, inputtime: np.ndarray) -> tuple:
-    """Select indexes to make daily average"""
-    logger = logging.getLogger("io_utilities.get_ids_start_end4timecrop")
-    dt_data = config["datatimeresolution"]
-    period_detection = config["period_detection"]
-    interval = period_detection / dt_data
-    #
-    lst_idstart = [id for id, el in enumerate(inputtime) if el == itime]
-    id_start = lst_idstart[0]
-    lst_idend = [id for id, el in enumerate(inputtime) if el == itime + dt.timedelta(hours=dt_data * interval)]
-    # If we reach the end of the dataset, there will be no index for the next time,
-    # eg. work on the year 1999, 01-01-2000 does not exist here, but we need its id for python average
-    if not lst_idend:
-        id_end = len(inputtime)
-    else:
-        id_end = [id for id, el in enumerate(inputtime) if el == itime + dt.timedelta(hours=dt_data * interval)][0]
-    return id_start, id_end
+    """Select indexes to make daily average (inputtime sorted)"""
+    ids_start, ids_end = get_periods_bounds([itime], inputtime, config)
+    return ids_start[0], ids_end[0]
+
+
+def get_periods_bounds(listofdates, inputtime: np.ndarray, config: dict) -> tuple:
+    """
+    Bounds of the time steps of each period of detection [date, date + period_detection[ for all the dates at once,
+    from the (sorted) input times
+    Returns: arrays of start (included) and end (excluded) indexes in inputtime, equal when the period has no data
+    """
+    inputhours = convert_date2num(list(inputtime))
+    starthours = convert_date2num(list(pd.DatetimeIndex(listofdates).to_pydatetime()))
+    ids_start = np.searchsorted(inputhours, starthours, side="left")
+    ids_end = np.searchsorted(inputhours, starthours + config["period_detection"], side="left")
+    return ids_start, ids_end
 
 
 def make_daily_average(variable2process: np.ndarray, inputtime: np.ndarray, config: dict) -> np.ndarray:
     """
-    Calculate the daily average of the input variable
-    Uses the config file for the time step of the data
+    Calculate the average of the input variable over each period of detection (eg. daily average)
+    Uses the config file for the time step of the data. Periods without data are NaN
     """
     logger = logging.getLogger("io_utilities.make_daily_average")
     logger.info("Computation of daily average")
-    daily_tmp_variable = []
     listofdates = create_list_of_dates(config)
-    for itime in listofdates:
-        # Select indexes to make daily average
-        id_start, id_end = get_ids_start_end4timecrop(itime, config, inputtime=inputtime)
-        # Daily mean of the input variable (OLR). Works as smoothing
-        variable4cb = np.nanmean(variable2process[id_start:id_end, ...], 0)
-        daily_tmp_variable.append(variable4cb)
-    # Stack list of daily averages
-    daily_variable = np.stack(daily_tmp_variable)
+    # time steps sorted once, then each period is a slice of time steps
+    inputtime = np.asarray(inputtime)
+    order = np.argsort(convert_date2num(list(inputtime)), kind="stable")
+    if np.any(order != np.arange(len(order))):
+        variable2process, inputtime = variable2process[order], inputtime[order]
+    accumulator = make_periods_accumulator(len(listofdates), variable2process.shape[1:], variable2process.dtype)
+    add_to_periods_accumulator(accumulator, variable2process, inputtime, listofdates, config)
+    daily_variable = periods_average(accumulator)
     logger.info("Computation of daily average done")
     return daily_variable
 
+
+def make_periods_accumulator(nperiods: int, shape: tuple, dtype=np.float32) -> dict:
+    """
+    Empty accumulator of the averages of a variable over the periods of detection
+    Returns dictionary with the sums of the values that are not NaN and their number, per period and grid point
+    """
+    return {
+        "sums": np.zeros((nperiods,) + tuple(shape), dtype=np.result_type(dtype, np.float32)),
+        # at most 24 time steps per period (hourly data, daily periods)
+        "counts": np.zeros((nperiods,) + tuple(shape), dtype=np.int16),
+    }
+
+
+def add_to_periods_accumulator(
+    accumulator: dict, variable2process: np.ndarray, inputtime: np.ndarray, listofdates, config: dict
+) -> dict:
+    """
+    Add the time steps of the variable (sorted input times, eg. from one file) to the sums of their periods.
+    Periods can be spread over several calls (eg. periods across two yearly files)
+    """
+    ids_start, ids_end = get_periods_bounds(listofdates, inputtime, config)
+    for iperiod in np.flatnonzero(ids_end > ids_start):
+        values = variable2process[ids_start[iperiod] : ids_end[iperiod]]
+        accumulator["sums"][iperiod] += np.nansum(values, 0)
+        accumulator["counts"][iperiod] += np.count_nonzero(~np.isnan(values), 0).astype(np.int16)
+    return accumulator
+
+
+def periods_average(accumulator: dict) -> np.ndarray:
+    """
+    Averages of the accumulator (NaN where there is no data). The sums of the accumulator are overwritten
+    """
+    logger = logging.getLogger("io_utilities.periods_average")
+    counts = accumulator["counts"]
+    nmissing = np.count_nonzero(~counts.reshape(len(counts), -1).any(axis=1))
+    if nmissing:
+        logger.warning(f"{nmissing} periods without data")
+    average = accumulator["sums"]
+    np.divide(average, counts, out=average, where=counts > 0, casting="unsafe")
+    average[counts == 0] = np.nan
+    return average
+
+
 def load_npydata(filename: str = None, config: dict = None, varname: str = None) -> np.ndarray:
     if not filename and not config:
         raise ValueError("Either filename or config must be provided.")
@@ -253,11 +366,14 @@ def load_npydata(filename: str = None, config: dict = None, varname: str = None)
     return var2load
 
 
-def load_data_from_saved_var_files(config: dict, varname: str):
+def load_data_from_saved_var_files(config: dict, varname: str, columns: list = None):
     """
     Load 1-year files and put the data into a list
+    The daily variable is memory-mapped from the consolidated store when it exists (see convert_dailyvar_files_to_store)
     config: config file from detection workflow or analysis
-    varname: list_of_cloud_bands, daily_variable
+    varname: list_of_cloud_bands, daily_variable, or cloud_bands_columns for the columns of the cloud bands
+        (see load_catalogue_columns), without the masks
+    columns: columns loaded for cloud_bands_columns (all if None)
     """
     logger = logging.getLogger("io_utilities.load_data_from_saved_var_files")
     if config["load_saved_files"]:
@@ -266,20 +382,33 @@ def load_data_from_saved_var_files(config: dict, varname: str):
         )
         if varname == "list_of_cloud_bands":
             datalist = []
-            extension_fout = ".bin"
             for iyear in range(int(config["datetime_startdate"].year), int(config["datetime_enddate"].year) + 1):
-                filename = f"{varname}{iyear}{config['datetime_startdate'].strftime('%m%d.%H')}-{iyear}{config['datetime_enddate'].strftime('%m%d.%H')}-{config['domain']}{extension_fout}"
-                if config["select_djfm"]:
-                    filename = filename.rsplit(".", 1)[0] + "_djfm" + extension_fout
-                # Load pickle list of CloudBands
-                var4oneyear = load_list(filename=f"{config['saved_dirpath']}/{filename}")
+                # Load list of CloudBands
+                var4oneyear = load_list(filename=f"{config['saved_dirpath']}/{yearly_cloudbands_filename(config, iyear)}")
                 datalist.extend(var4oneyear)
+        elif varname == "cloud_bands_columns":
+            if columns is not None:
+                # the number of times is needed to put the years one after the other
+                columns = list(dict.fromkeys(list(columns) + ["ntimes"]))
+            if cloudbands_extension(config) == ".npz":
+                datalist = concatenate_catalogue_columns(
+                    [
+                        load_catalogue_columns(f"{config['saved_dirpath']}/{yearly_cloudbands_filename(config, iyear)}", columns)
+                        for iyear in range(int(config["datetime_startdate"].year), int(config["datetime_enddate"].year) + 1)
+                    ]
+                )
+            else:
+                # pickled lists: the cloud bands are loaded and put into columns
+                datalist = cloud_bands_columns(load_data_from_saved_var_files(config, varname="list_of_cloud_bands"))
+                if columns is not None:
+                    datalist = {key: datalist[key] for key in columns}
+        elif varname == "daily_variable" and os.path.isfile(f"{dailyvar_store_dirpath(config)}/data.npy"):
+            # Consolidated store: only the period is paged in from disk
+            datalist = load_dailyvar_store(config)
         elif varname == "daily_variable":
             tmplist = []
             for iyear in range(int(config["datetime_startdate"].year), int(config["datetime_enddate"].year) + 1):
-                filename = f"{varname}{iyear}{config['datetime_startdate'].strftime('%m%d.%H')}-{iyear}{config['datetime_enddate'].strftime('%m%d.%H')}-{config['domain']}.npy"
-                if config["select_djfm"]:
-                    filename = filename.rsplit(".", 1)[0] + "_djfm" + ".npy"
+                filename = yearly_dailyvar_filename(config, iyear)
                 var4oneyear = load_npydata(filename=filename, config=config, varname=varname)
                 tmplist.append(var4oneyear)
             datalist = np.concatenate(tmplist, axis=0)
@@ -307,6 +436,110 @@ def npy_save_dailyvar(config, daily_variable):
     return
 
 
+def yearly_cloudbands_filename(config: dict, iyear: int) -> str:
+    """Name of the file of the list of cloud bands of one year (saved with pickle_save_cloudbands)"""
+    extension_fout = cloudbands_extension(config)
+    filename = f"list_of_cloud_bands{iyear}{config['datetime_startdate'].strftime('%m%d.%H')}-{iyear}{config['datetime_enddate'].strftime('%m%d.%H')}-{config['domain']}{extension_fout}"
+    if config["select_djfm"]:
+        filename = filename.rsplit(".", 1)[0] + "_djfm" + extension_fout
+    return filename
+
+
+def yearly_list_of_dates(config: dict, iyear: int) -> pd.DatetimeIndex:
+    """Times of the files of one year (eg. yearly_cloudbands_filename), as created by the detection of this year"""
+    config4oneyear = dict(
+        config,
+        datetime_startdate=config["datetime_startdate"].replace(year=iyear),
+        datetime_enddate=config["datetime_enddate"].replace(year=iyear),
+    )
+    return create_list_of_dates(config4oneyear)
+
+
+def yearly_dailyvar_filename(config: dict, iyear: int) -> str:
+    """Name of the file of the daily variable of one year (saved with npy_save_dailyvar)"""
+    filename = f"daily_variable{iyear}{config['datetime_startdate'].strftime('%m%d.%H')}-{iyear}{config['datetime_enddate'].strftime('%m%d.%H')}-{config['domain']}.npy"
+    if config["select_djfm"]:
+        filename = filename.rsplit(".", 1)[0] + "_djfm" + ".npy"
+    return filename
+
+
+def dailyvar_store_dirpath(config: dict) -> str:
+    """
+    Directory of the consolidated store of the daily variable of the domain and period of detection:
+    data.npy (time, latitude, longitude) over the whole record and dates.npy (datetime64) of the times
+    """
+    dirname = f"daily_variable-{config['domain']}-{float(config['period_detection']):g}h"
+    if config["select_djfm"]:
+        dirname += "_djfm"
+    return f"{config['saved_dirpath']}/{dirname}"
+
+
+def convert_dailyvar_files_to_store(config: dict) -> str:
+    """
+    Put the files of the daily variable of the years of the config file (see yearly_dailyvar_filename),
+    one after the other, into a consolidated store (see dailyvar_store_dirpath).
+    Files are copied one at a time through memory maps
+    Returns: directory of the store
+    """
+    logger = logging.getLogger("io_utilities.convert_dailyvar_files_to_store")
+    years = range(int(config["datetime_startdate"].year), int(config["datetime_enddate"].year) + 1)
+    yearly_data = []
+    yearly_dates = []
+    for iyear in years:
+        var4oneyear = np.load(f"{config['saved_dirpath']}/{yearly_dailyvar_filename(config, iyear)}", mmap_mode="r")
+        dates = yearly_list_of_dates(config, iyear).values.astype("datetime64[s]")
+        if len(dates) != len(var4oneyear):
+            raise ValueError(f"{len(var4oneyear)} times in the file of {iyear}, {len(dates)} expected")
+        yearly_data.append(var4oneyear)
+        yearly_dates.append(dates)
+    dates = np.concatenate(yearly_dates)
+    if np.any(np.diff(dates) <= np.timedelta64(0)):
+        raise ValueError("Times of the yearly files overlap or are not in order")
+    dirpath = dailyvar_store_dirpath(config)
+    os.makedirs(dirpath, exist_ok=True)
+    data = np.lib.format.open_memmap(
+        f"{dirpath}/data.npy", mode="w+", dtype=yearly_data[0].dtype, shape=(len(dates),) + yearly_data[0].shape[1:]
+    )
+    itime = 0
+    for iyear, var4oneyear in zip(years, yearly_data):
+        data[itime : itime + len(var4oneyear)] = var4oneyear
+        itime += len(var4oneyear)
+        logger.info(f"{iyear} added to the store")
+    data.flush()
+    del data
+    np.save(f"{dirpath}/dates.npy", dates)
+    logger.info(f"Daily variable store saved in {dirpath}")
+    return dirpath
+
+
+def load_dailyvar_store(config: dict) -> np.ndarray:
+    """
+    Daily variable of the times of the period of the config file (create_list_of_dates)
+    from the consolidated store (see dailyvar_store_dirpath).
+    The data are memory-mapped: only the times of the period are read, when they are used.
+    Changes of the returned array are not written to the store.
+    Raises ValueError if the store does not hold every time of the period
+    """
+    logger = logging.getLogger("io_utilities.load_dailyvar_store")
+    dirpath = dailyvar_store_dirpath(config)
+    data = np.load(f"{dirpath}/data.npy", mmap_mode="c")
+    dates = np.load(f"{dirpath}/dates.npy")
+    listofdates = create_list_of_dates(config).to_numpy().astype("datetime64[s]")
+    id_start = np.searchsorted(dates, listofdates[0], side="left") if len(listofdates) else 0
+    id_end = id_start + len(listofdates)
+    # The data must match the dates of the detection one to one
+    if not np.array_equal(dates[id_start:id_end], listofdates):
+        raise ValueError(
+            f"The store {dirpath} ({dates[0] if len(dates) else None} to {dates[-1] if len(dates) else None}) "
+            f"does not hold every time of the period {config['datetime_startdate']} to {config['datetime_enddate']} "
+            f"every {config['period_detection']}h"
+        )
+    datalist = data[id_start:id_end]
+    assert len(datalist) == len(listofdates)
+    logger.info(f"Daily variable loaded from {dirpath}")
+    return datalist
+
+
 def write_cloud_bands_to_netcdf(
     list_of_cloud_bands: list,
     cloud_band_array: np.ndarray,
@@ -350,7 +583,7 @@ def write_cloud_bands_to_netcdf(
     angle.units = "degrees"
 
     cbid = rootgrp.createVariable("id", "i8", ("time", "object"), fill_value=-9999)
-    cbid.description = "ids of cloud bands. yyyymmddhhMMSS_latitude_of_centroid"
+    cbid.description = "ids of cloud bands: yyyymmddhhMMSS * 100000 + index of the cloud band among the candidates of the date"
 
     lat_out = rootgrp.createVariable('latitude', np.float32, ('latitude',))
     lon_out = rootgrp.createVariable('longitude', np.float32, ('longitude',))
@@ -360,11 +593,14 @@ def write_cloud_bands_to_netcdf(
     lon_out[:] = lons[:]
     
     cloud_band_mask = rootgrp.createVariable("cloud_band_mask","f4",("time", "latitude", "longitude"), fill_value=-9999)
-    cloud_band_mask.description = "Mask of cloud bands"
+    cloud_band_mask.description = "Mask of cloud bands: index of the cloud band along the object dimension + 1, 0 outside cloud bands"
     # loop over the list of lists of objects and store the data
     for day_index, cbdays in enumerate(list_of_cloud_bands):
-        # Mask
-        cloud_band_mask[day_index, :, :] = cloud_band_array[day_index, :, :]
+        # Mask. If the map of cloud bands over time was not kept, it is built from the cloud bands of the day
+        if cloud_band_array is None:
+            cloud_band_mask[day_index, :, :] = make_cloud_bands_map(cbdays, (len(lats), len(lons)))
+        else:
+            cloud_band_mask[day_index, :, :] = cloud_band_array[day_index, :, :]
         for object_index, cloud_band in enumerate(cbdays):
             # date_number[day_index, object_index] = cloud_band.date_number
             area[day_index, object_index] = cloud_band.area
@@ -378,30 +614,141 @@ def write_cloud_bands_to_netcdf(
 
 
 
+def cloudbands_filename(config: dict) -> str:
+    """
+    Name of the file of the list of cloud bands of the period in saved_dirpath:
+    pickle file (.bin) or columnar catalogue (.npz) depending on cloudbands_format
+    """
+    file_basename = f"list_of_cloud_bands{config['startdate']}-{config['enddate']}-{config['domain']}"
+    if config["select_djfm"]:
+        file_basename += "_djfm"
+    return f"{config['saved_dirpath']}/{file_basename}{cloudbands_extension(config)}"
+
+
+def cloudbands_extension(config: dict) -> str:
+    """Extension of the files of lists of cloud bands: .npz for the columnar catalogue, .bin for pickle files"""
+    return ".npz" if config.get("cloudbands_format", "pickle") == "columnar" else ".bin"
+
+
 def pickle_save_cloudbands(config, list_of_cloud_bands):
     logger = logging.getLogger("io_utilities.pickle_save_cloudbands")
     outpath = config["saved_dirpath"]
     os.makedirs(outpath, exist_ok=True)
-    extension_fout = ".bin"
-    file_basename = f"list_of_cloud_bands{config['startdate']}-{config['enddate']}-{config['domain']}"
-    if config["select_djfm"]:
-        file_basename += "_djfm"
-    fout = f"{outpath}/{file_basename}{extension_fout}"
+    fout = cloudbands_filename(config)
     dump_list(list_of_cloud_bands, fout)
     logger.info("Cloud bands saved")
     return
 
 
+def tracking_state_filename(config: dict, date: dt.datetime) -> str:
+    """Name of the file of the tracking state (see tracking.tracking_from_maps) of the last day 'date' of a period"""
+    return f"{config['saved_dirpath']}/tracking_state{date.strftime('%Y%m%d.%H')}-{config['domain']}.bin"
+
+
+def save_tracking_state(config: dict, state: dict):
+    """Save the tracking state at the end of the period, from which the tracking of the next period will resume"""
+    logger = logging.getLogger("io_utilities.save_tracking_state")
+    os.makedirs(config["saved_dirpath"], exist_ok=True)
+    fout = tracking_state_filename(config, config["datetime_enddate"])
+    with open(fout, "wb") as f:
+        pickle.dump(state, f)
+    logger.info(f"Tracking state saved in {fout}")
+    return
+
+
+def load_tracking_state(config: dict) -> dict:
+    """
+    Load the tracking state at the end of the previous period (ending 'period_detection' hours before the start date).
+    Returns: the tracking state, or an empty state if the previous period has not been tracked
+    """
+    logger = logging.getLogger("io_utilities.load_tracking_state")
+    previous_date = config["datetime_startdate"] - dt.timedelta(hours=config["period_detection"])
+    filename = tracking_state_filename(config, previous_date)
+    if not os.path.isfile(filename):
+        logger.warning(f"{filename} not found. Cloud bands of the first day will have no parents")
+        return {}
+    with open(filename, "rb") as f:
+        state = pickle.load(f)
+    logger.info(f"Tracking state loaded from {filename}")
+    return state
+
+
+
+def candidates_catalogue_settings(config: dict, parameters: dict) -> dict:
+    """Configuration and parameters on which the cloud band candidates depend"""
+    settings = {key: config.get(key) for key in CANDIDATES_CONFIG_KEYS}
+    settings.update({key: parameters.get(key) for key in CANDIDATES_PARAMETERS_KEYS})
+    return settings
+
+
+def candidates_catalogue_key(config: dict, parameters: dict) -> str:
+    """Short hash of the settings on which the cloud band candidates depend"""
+    settings = json.dumps(candidates_catalogue_settings(config, parameters), sort_keys=True, default=str)
+    return hashlib.sha1(settings.encode()).hexdigest()[:12]
+
+
+def candidates_catalogue_filename(config: dict, parameters: dict) -> str:
+    """
+    Name of the catalogue of cloud band candidates in saved_dirpath.
+    The key in the name changes with the preprocessing and the thresholds,
+    not with the criteria used to select cloud bands among the candidates (angles and latitudes)
+    """
+    file_basename = f"list_of_candidates{config['startdate']}-{config['enddate']}-{config['domain']}"
+    if config["select_djfm"]:
+        file_basename += "_djfm"
+    return f"{config['saved_dirpath']}/{file_basename}_{candidates_catalogue_key(config, parameters)}.bin"
+
+
+def save_candidates_catalogue(config: dict, parameters: dict, list_of_candidates: list, lons: np.ndarray, lats: np.ndarray):
+    """
+    Save all cloud band candidates (1 list per day), with the settings they depend on and the longitudes and latitudes
+    of the domain, so that cloud bands can be selected again with other criteria without running the detection
+    """
+    logger = logging.getLogger("io_utilities.save_candidates_catalogue")
+    os.makedirs(config["saved_dirpath"], exist_ok=True)
+    fout = candidates_catalogue_filename(config, parameters)
+    catalogue = {
+        "settings": candidates_catalogue_settings(config, parameters),
+        "lons": lons,
+        "lats": lats,
+        "candidates": [[c.todict() for c in j] for j in list_of_candidates],
+    }
+    with open(fout, "wb") as f:
+        pickle.dump(catalogue, f)
+    logger.info(f"Candidates catalogue saved in {fout}")
+    return
+
+
+def load_candidates_catalogue(config: dict, parameters: dict) -> tuple:
+    """
+    Load the catalogue of cloud band candidates matching the configuration and the thresholds of the parameters
+    Returns: list of lists of candidates (1 list per day), longitudes and latitudes of the domain
+    """
+    logger = logging.getLogger("io_utilities.load_candidates_catalogue")
+    filename = candidates_catalogue_filename(config, parameters)
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(
+            f"{filename} not found. Run the detection with save_candidates: True and the same settings first."
+        )
+    with open(filename, "rb") as f:
+        catalogue = pickle.load(f)
+    list_of_candidates = [[CloudBand.fromdict(e) for e in j] for j in catalogue["candidates"]]
+    logger.info(f"Candidates catalogue loaded from {filename}")
+    return list_of_candidates, catalogue["lons"], catalogue["lats"]
+
 
 def dump_list(l, filename):
     """
     Dumps a list of lists of instances of `CloudBand` into a pickle file,
     after converting the instances to dictionaries, so that `CloudBand`
-    is not pickled
+    is not pickled. If the file name ends with .npz, the columnar catalogue
+    is written instead (see dump_catalogue)
 
     Input:
         filename: Output file name (str)
     """
+    if filename.endswith(".npz"):
+        return dump_catalogue(l, filename)
     with open(filename, "wb") as f:
         pickle.dump([[c.todict() for c in j] for j in l], f)
 
@@ -409,10 +756,12 @@ def dump_list(l, filename):
 def load_list(filename):
     """
     Loads a pickle file constructed with `dump_list` into a list of
-    lists of instances of `CloudBand`
+    lists of instances of `CloudBand` (or a columnar catalogue if the file name ends with .npz)
 
     Returns: list with data
     """
+    if filename.endswith(".npz"):
+        return load_catalogue(filename)
     try:
         with open(filename, "rb") as f:
             return [[CloudBand.fromdict(e) for e in j] for j in pickle.load(f)]
@@ -420,4 +769,122 @@ def load_list(filename):
         raise FileNotFoundError(f"{filename} not found.")
     except Exception as e:
         raise e
-    
+
+
+def catalogue_masks_filename(filename: str) -> str:
+    """Name of the file of the masks of the columnar catalogue 'filename'"""
+    return filename.rsplit(".", 1)[0] + "_masks.npz"
+
+
+def dump_catalogue(list_of_cloud_bands: list, filename: str):
+    """
+    Dumps a list of lists of instances of `CloudBand` into a columnar catalogue:
+        - filename (.npz): one array per attribute, one element per cloud band (see cloudband.cloud_bands_columns)
+        - catalogue_masks_filename(filename): compressed block of the masks one after the other, bit-packed
+    Scalar columns can then be read without the masks (see load_catalogue_columns)
+    """
+    clouds = [cloud for clouds in list_of_cloud_bands for cloud in clouds]
+    masks = np.concatenate([cloud.mask.ravel() != 0 for cloud in clouds]) if clouds else np.array([], dtype=bool)
+    np.savez(filename, **cloud_bands_columns(list_of_cloud_bands))
+    np.savez_compressed(catalogue_masks_filename(filename), masks=np.packbits(masks), nbits=np.array(masks.size))
+
+
+def load_catalogue_columns(filename: str, columns: list = None) -> dict:
+    """
+    Loads some columns of a columnar catalogue (see dump_catalogue), eg. ["date", "area"].
+    Only the columns asked for are read, the masks are not
+    Returns: dictionary of arrays (all columns if columns is None)
+    """
+    if not os.path.isfile(filename):
+        raise FileNotFoundError(f"{filename} not found.")
+    with np.load(filename) as catalogue:
+        return {key: catalogue[key] for key in (columns if columns is not None else catalogue.files)}
+
+
+def concatenate_catalogue_columns(list_of_columns: list) -> dict:
+    """Columns of catalogues of consecutive periods (eg. years) put one after the other"""
+    concatenated = {}
+    for key in list_of_columns[0]:
+        if key == "ntimes":
+            concatenated[key] = np.array(sum(int(columns[key]) for columns in list_of_columns))
+        elif key == "time_index":
+            offsets = np.cumsum([0] + [int(columns["ntimes"]) for columns in list_of_columns[:-1]])
+            concatenated[key] = np.concatenate([columns[key] + offset for columns, offset in zip(list_of_columns, offsets)])
+        elif key == "parents_ptr":
+            offsets = np.cumsum([0] + [columns[key][-1] for columns in list_of_columns[:-1]])
+            concatenated[key] = np.concatenate(
+                [list_of_columns[0][key][:1]] + [columns[key][1:] + offset for columns, offset in zip(list_of_columns, offsets)]
+            )
+        else:
+            concatenated[key] = np.concatenate([columns[key] for columns in list_of_columns])
+    return concatenated
+
+
+def load_catalogue_masks(filename: str) -> np.ndarray:
+    """Bit-packed masks of a columnar catalogue (see dump_catalogue)"""
+    with np.load(catalogue_masks_filename(filename)) as masks_file:
+        return masks_file["masks"]
+
+
+def catalogue_masks_start(mask_shape: np.ndarray) -> np.ndarray:
+    """Position of the first bit of each mask in the block of masks, from the column mask_shape"""
+    sizes = mask_shape[:, 0].astype(np.int64) * mask_shape[:, 1]
+    return np.cumsum(sizes) - sizes
+
+
+def decode_catalogue_mask(packed_masks: np.ndarray, start: int, shape: tuple) -> np.ndarray:
+    """Mask of shape 'shape' starting at the bit 'start' of the block of bit-packed masks"""
+    nbits = int(shape[0]) * int(shape[1])
+    packed = packed_masks[start // 8 : (start + nbits + 7) // 8]
+    return np.unpackbits(packed)[start % 8 : start % 8 + nbits].reshape(shape)
+
+
+def _decode_catalogue_mask_on_demand(masks_block: dict, filename: str, start: int, shape: tuple) -> np.ndarray:
+    """Mask of a cloud band of a catalogue. The block of masks, shared by the cloud bands, is read once"""
+    if "masks" not in masks_block:
+        masks_block["masks"] = load_catalogue_masks(filename)
+    return decode_catalogue_mask(masks_block["masks"], start, shape)
+
+
+def load_catalogue(filename: str) -> list:
+    """
+    Loads a columnar catalogue (see dump_catalogue) into a list of lists of instances of `CloudBand`.
+    The masks are loaded on demand: the mask of a cloud band is decoded when it is first used
+
+    Returns: list with data
+    """
+    columns = load_catalogue_columns(filename)
+    nrows, ncols = columns["mask_shape"].T
+    masks_start = catalogue_masks_start(columns["mask_shape"])
+    rows_end, cols_end = np.cumsum(nrows), np.cumsum(ncols)
+    masks_block = {}
+    list_of_cloud_bands = [[] for _ in range(int(columns["ntimes"]))]
+    for icloud, itime in enumerate(columns["time_index"]):
+        parents = columns["parents"][columns["parents_ptr"][icloud] : columns["parents_ptr"][icloud + 1]]
+        index = int(columns["index"][icloud])
+        cloud = CloudBand(
+            partial(
+                _decode_catalogue_mask_on_demand,
+                masks_block,
+                filename,
+                int(masks_start[icloud]),
+                (int(nrows[icloud]), int(ncols[icloud])),
+            ),
+            int(columns["date"][icloud]),
+            float(columns["area"][icloud]),
+            columns["bbox_lats"][rows_end[icloud] - nrows[icloud] : rows_end[icloud]],
+            columns["bbox_lons"][cols_end[icloud] - ncols[icloud] : cols_end[icloud]],
+            float(columns["angle"][icloud]),
+            float(columns["lon_centroid"][icloud]),
+            float(columns["lat_centroid"][icloud]),
+            bool(columns["iscloudband"][icloud]),
+            bool(columns["connected_longitudes"][icloud]),
+            set(parents.tolist()),
+            lat_min=float(columns["lat_min"][icloud]),
+            lat_max=float(columns["lat_max"][icloud]),
+            offset=columns["offset"][icloud],
+            domain_shape=columns["domain_shape"][icloud],
+            index=None if index < 0 else index,
+        )
+        list_of_cloud_bands[itime].append(cloud)
+    return list_of_cloud_bands
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Kinematics of the tracked cloud bands: displacement of each cloud band from its parents.
+
+The kinematics are computed for all the cloud bands of the catalogue at once from the arrays of the track table
+(see tracking.build_tracks) and the links between cloud bands and parents. The centroids of the cloud bands
+crossing the 0/360 seam are circular means of their longitudes (see cb_detection.circular_mean_longitude),
+and longitude differences are wrapped to [-180, 180[ so that these cloud bands move by a few degrees, not by 360.
+"""
+
+import logging
+import numpy as np
+
+from .cloudband import cloud_bands_columns
+from .time_utilities import date_numbers_to_datetime64
+from .tracking import parent_links
+
+EARTH_RADIUS = 6371.0e3  # m
+SECONDS_PER_DAY = 86400.0
+
+
+def compute_kinematics(list_of_cloud_bands: list, objects: dict, tracks: dict = None) -> dict:
+    """
+    Propagation speed and direction, area growth rate and latitude drift of each cloud band from its parents
+    Args:
+        - list_of_cloud_bands: list of lists of tracked cloud bands (parents are set)
+        - objects, tracks: see compute_kinematics_from_columns
+    Returns: the table of the cloud bands
+    """
+    return compute_kinematics_from_columns(cloud_bands_columns(list_of_cloud_bands), objects, tracks)
+
+
+def compute_kinematics_from_columns(columns: dict, objects: dict, tracks: dict = None) -> dict:
+    """
+    Propagation speed and direction, area growth rate and latitude drift of each cloud band from its parents.
+    When a cloud band has several parents, their displacements are averaged, weighted by the area of the parents.
+    Cloud bands without parents get NaN.
+    Args:
+        - columns: columns of the tracked cloud bands, with id, parents and parents_ptr
+            (see cloudband.cloud_bands_columns or io_utilities.load_catalogue_columns)
+        - objects: table of the cloud bands (see tracking.build_tracks), updated with:
+            - speed: propagation speed (m.s-1)
+            - direction: direction towards which the cloud band moves (degrees, clockwise from north)
+            - area_growth_rate: change of area from the total area of the parents (km2 per day)
+            - lat_drift: change of latitude of the centroid (degrees per day)
+        - tracks: table of the tracks (see tracking.build_tracks). If given, it is updated with the mean
+            speed, area growth rate and latitude drift over each track (mean_speed, mean_area_growth_rate, mean_lat_drift)
+    Returns: the table of the cloud bands
+    """
+    logger = logging.getLogger("kinematics.compute_kinematics")
+    nobjects = len(objects["id"])
+    # Links child -> parent, as positions in the table
+    children, parents = parent_links(columns, objects["id"])
+    times = date_numbers_to_datetime64(objects["date"])
+    elapsed_days = (times[children] - times[parents]).astype(float) / SECONDS_PER_DAY
+    # Displacement of each link, longitudes across the seam are wrapped
+    dlon = (objects["lon_centroid"][children] - objects["lon_centroid"][parents] + 180.0) % 360.0 - 180.0
+    dlat = objects["lat_centroid"][children] - objects["lat_centroid"][parents]
+    mean_lat = np.deg2rad(0.5 * (objects["lat_centroid"][children] + objects["lat_centroid"][parents]))
+    dx = EARTH_RADIUS * np.cos(mean_lat) * np.deg2rad(dlon) / elapsed_days
+    dy = EARTH_RADIUS * np.deg2rad(dlat) / elapsed_days
+    # Average over the parents of each cloud band, weighted by the area of the parents
+    weights = objects["area"][parents]
+
+    def mean_over_parents(values):
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.bincount(children, weights=weights * values, minlength=nobjects) / np.bincount(
+                children, weights=weights, minlength=nobjects
+            )
+
+    u, v = mean_over_parents(dx) / SECONDS_PER_DAY, mean_over_parents(dy) / SECONDS_PER_DAY
+    objects["speed"] = np.hypot(u, v)
+    objects["direction"] = np.rad2deg(np.arctan2(u, v)) % 360.0
+    objects["lat_drift"] = mean_over_parents(dlat / elapsed_days)
+    parents_area = np.bincount(children, weights=weights, minlength=nobjects)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        objects["area_growth_rate"] = (objects["area"] - parents_area) / mean_over_parents(elapsed_days)
+    if tracks is not None:
+        track_of_object = np.searchsorted(tracks["track_id"], objects["track_id"])
+        for key in ("speed", "area_growth_rate", "lat_drift"):
+            tracks[f"mean_{key}"] = _nanmean_by_group(objects[key], track_of_object, len(tracks["track_id"]))
+    logger.info(f"Kinematics of {len(np.unique(children))} cloud bands with parents computed")
+    return objects
+
+
+def _nanmean_by_group(values: np.ndarray, groups: np.ndarray, ngroups: int) -> np.ndarray:
+    """Mean of the values that are not NaN in each group (NaN if none)"""
+    isvalid = ~np.isnan(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.bincount(groups[isvalid], weights=values[isvalid], minlength=ngroups) / np.bincount(
+            groups[isvalid], minlength=ngroups
+        )
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Merge the cloud bands detected over overlapping domains (eg. basins and hemisphere run in parallel)
+into one catalogue without duplicates.
+
+The cloud bands of each domain are projected onto a common grid. For each time, cloud bands of different domains
+are compared when their bounding boxes share a cell of a coarse spatial hash of the common grid, and they are
+duplicates when their masks overlap by more than a fraction of the smaller one (a cloud band clipped by the border
+of a basin is included in the cloud band detected over the hemisphere). The largest cloud band of each group
+of duplicates is kept.
+"""
+
+import logging
+import numpy as np
+
+from .cloudband import CloudBand
+from .tracking import overlap_area
+
+# Size of the cells of the spatial hash (grid points)
+HASH_CELL_SIZE = 16
+
+
+def merge_domain_catalogues(
+    catalogues: list,
+    lats: np.ndarray,
+    lons: np.ndarray,
+    overlap_threshold: float = 0.5,
+) -> list:
+    """
+    Merge the catalogues of cloud bands of several domains, for the same times
+    Args:
+        - catalogues: list (one per domain) of lists of lists of cloud bands (1 list per time)
+        - lats, lons: latitudes and longitudes of the common grid, covering the domains (eg. hemisphere)
+        - overlap_threshold: cloud bands overlapping by more than this fraction of the area (grid points)
+            of the smaller one are duplicates
+    Returns: list of lists of cloud bands on the common grid (1 list per time). Cloud bands are given new ids
+        (see CloudBand) and no parents: the tracking has to be run on the merged catalogue
+    """
+    logger = logging.getLogger("merge_domains.merge_domain_catalogues")
+    ntimes = {len(catalogue) for catalogue in catalogues}
+    if len(ntimes) != 1:
+        raise ValueError("Catalogues of the domains must have the same number of times")
+    lons360 = np.asarray(lons) % 360.0
+    list_of_cloud_bands = []
+    nduplicates = 0
+    for clouds_of_domains in zip(*catalogues):
+        projected = [project_cloud_band(cloud, lats, lons360) for clouds in clouds_of_domains for cloud in clouds]
+        kept = _remove_duplicates(projected, len(lats), overlap_threshold)
+        nduplicates += len(projected) - len(kept)
+        # New ids, in the order of the positions of the cloud bands on the common grid
+        kept = sorted(kept, key=lambda cloud: (cloud.offset[1], cloud.offset[0]))
+        list_of_cloud_bands.append([_with_index(cloud, index) for index, cloud in enumerate(kept)])
+    logger.info(f"{nduplicates} duplicated cloud bands removed")
+    return list_of_cloud_bands
+
+
+def project_cloud_band(cloud: CloudBand, lats: np.ndarray, lons360: np.ndarray) -> CloudBand:
+    """
+    Cloud band on the common grid of latitudes and longitudes (wrapped to 0-360).
+    If the columns of the cloud band cross the first/last longitudes of the common grid, its bounding box
+    on the common grid covers all the longitudes
+    """
+    rows = _nearest_indices(cloud.bbox_lats, lats)
+    cols = _nearest_indices(np.asarray(cloud.bbox_lons) % 360.0, lons360)
+    if np.all(np.diff(cols) == 1) or cols.size <= 1:
+        col_offset, ncols = int(cols[0]) if cols.size else 0, cols.size
+    else:
+        col_offset, ncols = 0, len(lons360)
+    row_offset = int(rows.min()) if rows.size else 0
+    mask = np.zeros((rows.size, ncols), dtype=np.uint8)
+    mask[np.ix_(rows - row_offset, cols - col_offset)] = cloud.mask
+    return CloudBand(
+        mask,
+        cloud.date,
+        cloud.area,
+        lats[row_offset : row_offset + rows.size],
+        lons360[col_offset : col_offset + ncols],
+        cloud.angle,
+        cloud.lon_centroid,
+        cloud.lat_centroid,
+        cloud.iscloudband,
+        cloud.connected_longitudes,
+        set(),
+        lat_min=cloud.lat_min,
+        lat_max=cloud.lat_max,
+        offset=(row_offset, col_offset),
+        domain_shape=(len(lats), len(lons360)),
+        index=cloud.index,
+    )
+
+
+def _nearest_indices(values: np.ndarray, grid: np.ndarray) -> np.ndarray:
+    """Indices of the nearest grid values"""
+    return np.abs(np.asarray(grid)[None, :] - np.asarray(values)[:, None]).argmin(axis=1)
+
+
+def _remove_duplicates(clouds: list, nlats: int, overlap_threshold: float) -> list:
+    """Keep the largest cloud band (number of grid points) of each group of overlapping cloud bands"""
+    # Spatial hash: cells covered by the bounding box of each cloud band
+    cells = {}
+    for icloud, cloud in enumerate(clouds):
+        rows, cols = cloud.bbox
+        for row_cell in range(rows.start // HASH_CELL_SIZE, (rows.stop - 1) // HASH_CELL_SIZE + 1):
+            for col_cell in range(cols.start // HASH_CELL_SIZE, (cols.stop - 1) // HASH_CELL_SIZE + 1):
+                cells.setdefault((row_cell, col_cell), []).append(icloud)
+    pairs = {(i, j) for members in cells.values() for i in members for j in members if i < j}
+    npoints = np.array([cloud.mask.sum() for cloud in clouds])
+    ones = np.ones(nlats)
+    # union-find of the duplicates
+    group = list(range(len(clouds)))
+
+    def find(index):
+        while group[index] != index:
+            group[index] = group[group[index]]
+            index = group[index]
+        return index
+
+    for i, j in sorted(pairs):
+        overlap = overlap_area(clouds[i], clouds[j], ones)
+        if overlap > overlap_threshold * min(npoints[i], npoints[j]):
+            root1, root2 = find(i), find(j)
+            if root1 != root2:
+                group[max(root1, root2)] = min(root1, root2)
+    largest = {}
+    for icloud in range(len(clouds)):
+        root = find(icloud)
+        if root not in largest or npoints[icloud] > npoints[largest[root]]:
+            largest[root] = icloud
+    return [clouds[icloud] for icloud in sorted(largest.values())]
+
+
+def _with_index(cloud: CloudBand, index: int) -> CloudBand:
+    """Copy of the cloud band with a new index (and id)"""
+    return CloudBand.fromdict(dict(cloud.todict(), index=index, parents=set()))
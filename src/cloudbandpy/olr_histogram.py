@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Histograms of OLR over fixed bins, for histogram-based thresholding (Yen or Otsu methods).
+
+The histogram of each frame is computed once, while the data stream by. It gives the threshold of the frame,
+and it is added to an accumulator (dictionary) from which the running climatological threshold and the PDF
+of the whole period are computed, without concatenating the frames.
+"""
+
+import numpy as np
+from skimage.filters import threshold_otsu, threshold_yen
+
+# Fixed bins of OLR (W.m-2). Values out of the bins are counted in the first or last bin
+OLR_BIN_EDGES = np.arange(0.0, 500.5, 0.5)
+# Histogram-based thresholding methods
+THRESHOLDING_METHODS = {"yen": threshold_yen, "otsu": threshold_otsu}
+
+
+def make_histogram_accumulator(bin_edges: np.ndarray = OLR_BIN_EDGES) -> dict:
+    """
+    Empty accumulator of histograms
+    Returns dictionary with the bin edges, the counts of all frames and the number of frames
+    """
+    bin_edges = np.asarray(bin_edges, dtype=float)
+    return {"bin_edges": bin_edges, "counts": np.zeros(len(bin_edges) - 1, dtype=np.int64), "nframes": 0}
+
+
+def frame_histogram(frame: np.ndarray, bin_edges: np.ndarray = OLR_BIN_EDGES) -> np.ndarray:
+    """Counts of the (finite) values of one frame in the bins"""
+    values = np.asarray(frame, dtype=float).ravel()
+    values = np.clip(values[np.isfinite(values)], bin_edges[0], bin_edges[-1])
+    counts, _ = np.histogram(values, bins=bin_edges)
+    return counts
+
+
+def add_frame_histogram(accumulator: dict, counts: np.ndarray) -> dict:
+    """Add the histogram of one frame to the accumulator"""
+    accumulator["counts"] += counts
+    accumulator["nframes"] += 1
+    return accumulator
+
+
+def merge_histogram_accumulators(*accumulators) -> dict:
+    """Merge accumulators (eg. of different years or processes) built with the same bins"""
+    merged = make_histogram_accumulator(accumulators[0]["bin_edges"])
+    for accumulator in accumulators:
+        if not np.array_equal(accumulator["bin_edges"], merged["bin_edges"]):
+            raise ValueError("Histograms with different bins cannot be merged")
+        merged["counts"] += accumulator["counts"]
+        merged["nframes"] += accumulator["nframes"]
+    return merged
+
+
+def histogram_threshold(counts: np.ndarray, bin_edges: np.ndarray, method: str) -> float:
+    """
+    Threshold of the Yen or Otsu method ('method') computed from a histogram.
+    As for a histogram computed from an image, only the bins between the lowest and highest values are used.
+    """
+    if method not in THRESHOLDING_METHODS:
+        raise ValueError(f"Unknown thresholding method {method}, expected one of {list(THRESHOLDING_METHODS)}")
+    bin_centers = 0.5 * (bin_edges[1:] + bin_edges[:-1])
+    nonzero = np.flatnonzero(counts)
+    if nonzero.size == 0:
+        raise ValueError("Empty histogram: the threshold cannot be computed")
+    if nonzero.size == 1:
+        return bin_centers[nonzero[0]]
+    used_bins = slice(nonzero[0], nonzero[-1] + 1)
+    return THRESHOLDING_METHODS[method](hist=(counts[used_bins], bin_centers[used_bins]))
+
+
+def histogram_pdf(accumulator: dict) -> tuple:
+    """
+    Probability density function of the values accumulated
+    Returns: PDF and centers of the bins
+    """
+    bin_edges = accumulator["bin_edges"]
+    counts = accumulator["counts"]
+    pdf = counts / max(counts.sum(), 1) / np.diff(bin_edges)
+    return pdf, 0.5 * (bin_edges[1:] + bin_edges[:-1])
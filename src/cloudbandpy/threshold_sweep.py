@@ -0,0 +1,249 @@
+#!/usr/bin/env python
+# coding: utf-8
+"""
+Sensitivity of the cloud band detection to the OLR threshold and to the cloud band area threshold.
+
+For a given time, the blobs detected with the threshold t are the 8-connected components of
+dilation(fill_holes(OLR < t)). Hole filling and dilation are increasing operators that commute with thresholding:
+    fill_holes(OLR < t) = {reconstruction(OLR) < t}, with a grayscale reconstruction from the borders of the domain
+    dilation(X < t) = {erosion(X) < t}
+so that the blobs at all thresholds are the components of the threshold sets of one image, which are nested.
+They are the nodes of one component tree built per time. The statistics of the blobs (area, bounding box, moments)
+are sums, accumulated from the leaves to the root of the tree, so that the cloud band criteria can be applied
+to the blobs of all thresholds at once.
+"""
+
+import logging
+import numpy as np
+from scipy import ndimage as ndi
+from skimage import morphology
+
+from .cb_detection import (
+    blob_statistics_from_sums,
+    compute_candidates_geometry,
+    is_hemispheric_domain,
+    select_cloudbands_from_statistics,
+)
+
+# Neighbourhood of the hole filling (background) and of the dilation
+CROSS = ndi.generate_binary_structure(2, 1)
+# Connectivity of the blobs
+EIGHT_CONNECTIVITY = ndi.generate_binary_structure(2, 2)
+# Additive statistics of the blobs accumulated in the component tree
+SUMS = ("npixels", "area", "m10", "m01", "m20", "m11", "m02")
+
+
+def threshold_sweep(
+    var2process,
+    parameters: dict,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    resolution: np.ndarray,
+    config: dict,
+    olr_thresholds,
+    area_thresholds,
+) -> dict:
+    """
+    Number and area of cloud bands per day for all combinations of OLR_THRESHOLD and CLOUD_BAND_AREA_THRESHOLD.
+    Other criteria (latitudes and angles) are read from the parameters.
+    Args:
+        - var2process: variable used for detection (time first), or any iterable of 2D arrays
+        - parameters, latitudes, longitudes, resolution, config: see cb_detection.detection_workflow
+        - olr_thresholds: values of OLR_THRESHOLD
+        - area_thresholds: values of CLOUD_BAND_AREA_THRESHOLD (km2)
+    Returns dictionary with:
+        - olr_thresholds, area_thresholds: sorted thresholds
+        - number_of_cloud_bands: array (time, olr threshold, area threshold) of the number of cloud bands
+        - cloud_bands_area: array (time, olr threshold, area threshold) of the total area of the cloud bands (km2)
+    """
+    logger = logging.getLogger("threshold_sweep.threshold_sweep")
+    logger.info("Threshold sweep in progress")
+    olr_thresholds = np.unique(np.asarray(olr_thresholds, dtype=float))
+    area_thresholds = np.unique(np.asarray(area_thresholds, dtype=float))
+    connectlongitudes = is_hemispheric_domain(config)
+    number_of_cloud_bands = []
+    cloud_bands_area = []
+    for variable in var2process:
+        ncb, cbarea = threshold_sweep_one_time(
+            variable,
+            parameters,
+            latitudes,
+            longitudes,
+            resolution,
+            olr_thresholds,
+            area_thresholds,
+            connectlongitudes,
+        )
+        number_of_cloud_bands.append(ncb)
+        cloud_bands_area.append(cbarea)
+    logger.info("Threshold sweep done")
+    return {
+        "olr_thresholds": olr_thresholds,
+        "area_thresholds": area_thresholds,
+        "number_of_cloud_bands": np.array(number_of_cloud_bands),
+        "cloud_bands_area": np.array(cloud_bands_area),
+    }
+
+
+def threshold_sweep_one_time(
+    variable: np.ndarray,
+    parameters: dict,
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    resolution: np.ndarray,
+    olr_thresholds: np.ndarray,
+    area_thresholds: np.ndarray,
+    connectlongitudes: bool = False,
+) -> tuple:
+    """
+    For one time, number and total area of cloud bands for each (sorted) OLR threshold and area threshold
+    Returns: two arrays (olr threshold, area threshold)
+    """
+    nthresholds = len(olr_thresholds)
+    # Sanitize input. make sure all values < 0 are all set to 0
+    variable = np.where(variable < 0, 0, variable)
+    # Image whose threshold sets are the dilated and filled blobs of every threshold
+    seed = np.full_like(variable, variable.min())
+    seed[[0, -1], :] = variable[[0, -1], :]
+    seed[:, [0, -1]] = variable[:, [0, -1]]
+    filled = morphology.reconstruction(seed, variable, method="dilation", footprint=CROSS)
+    blobs_image = ndi.grey_erosion(filled, footprint=CROSS, mode="nearest")
+    # Index of the first threshold at which each pixel belongs to a blob (nthresholds: never)
+    pixel_level = np.searchsorted(olr_thresholds, blobs_image, side="right")
+    tree = _component_tree(pixel_level, nthresholds, resolution)
+    number_of_cloud_bands = np.zeros((nthresholds, len(area_thresholds)), dtype=int)
+    cloud_bands_area = np.zeros((nthresholds, len(area_thresholds)))
+    for ithreshold in range(nthresholds):
+        # Blobs at this threshold are the nodes of this level
+        isblob = tree["level"] == ithreshold
+        blobs_sums = {key: tree[key][isblob] for key in SUMS + ("row_min", "row_max", "col_min", "col_max")}
+        if connectlongitudes:
+            blobs_sums = _merge_through_longitudes(tree, isblob, blobs_sums, ithreshold)
+        blobs_stats = blob_statistics_from_sums(
+            np.arange(1, len(blobs_sums["area"]) + 1),
+            *[blobs_sums[key] for key in SUMS + ("row_min", "row_max", "col_min", "col_max")],
+        )
+        iscloudband = select_cloudbands_from_statistics(
+            compute_candidates_geometry(blobs_stats, longitudes, latitudes), parameters
+        )
+        # Cloud bands are the blobs of large enough area that fulfill the criteria
+        areas = np.sort(blobs_stats["area"][iscloudband])
+        nlarger = len(areas) - np.searchsorted(areas, area_thresholds, side="left")
+        cumulated_areas = np.concatenate((np.cumsum(areas[::-1])[::-1], [0.0]))
+        number_of_cloud_bands[ithreshold] = nlarger
+        cloud_bands_area[ithreshold] = cumulated_areas[len(areas) - nlarger]
+    return number_of_cloud_bands, cloud_bands_area
+
+
+def _component_tree(pixel_level: np.ndarray, nthresholds: int, resolution: np.ndarray) -> dict:
+    """
+    Component tree of the blobs of all thresholds, with the sums of each node accumulated over its subtree
+    The nodes of level l are the 8-connected components of {pixel_level <= l}: they are labelled level after level,
+    each node of level l being included in one node (its parent) of level l + 1.
+    Pixels are only attached to the node of the level at which they enter the blobs, and the sums of the nodes are
+    accumulated from the leaves to the root.
+    Returns dictionary of arrays (one element per node): level, parent, sums (see SUMS), bounding boxes,
+    and the nodes of the pixels of the first and last columns for each level (seam_nodes)
+    """
+    ncols = pixel_level.shape[1]
+    flat_levels = pixel_level.ravel()
+    pixel_node = np.full(flat_levels.size, -1, dtype=np.intp)
+    level = []
+    parent = []
+    seam_nodes = []
+    nnodes = 0
+    previous_labels, previous_nnodes = None, 0
+    for ilevel in range(nthresholds):
+        labels, nlabels = ndi.label(pixel_level <= ilevel, structure=EIGHT_CONNECTIVITY)
+        labels = labels.ravel()
+        nodes = np.where(labels > 0, labels - 1 + nnodes, -1)
+        # pixels entering the blobs at this level
+        entering = flat_levels == ilevel
+        pixel_node[entering] = nodes[entering]
+        # parent of the nodes of the previous level: node of any of their pixels at this level
+        if previous_labels is not None:
+            inside = np.flatnonzero(previous_labels)
+            one_pixel = np.empty(previous_nnodes, dtype=np.intp)
+            one_pixel[previous_labels[inside] - 1] = inside
+            parent.append(nodes[one_pixel])
+        level.append(np.full(nlabels, ilevel))
+        seam_nodes.append(nodes.reshape(pixel_level.shape)[:, [0, -1]])
+        previous_labels, previous_nnodes = labels, nlabels
+        nnodes += nlabels
+    # Nodes of the last level have no parent
+    parent.append(np.full(previous_nnodes, -1, dtype=np.intp))
+    level, parent = np.concatenate(level), np.concatenate(parent)
+    # Statistics of the pixels attached to each node
+    pixels = np.flatnonzero(pixel_node >= 0)
+    pixel_node = pixel_node[pixels]
+    rows, cols = np.divmod(pixels, ncols)
+    tree = {
+        "level": level,
+        "parent": parent,
+        "seam_nodes": seam_nodes,
+        "npixels": np.bincount(pixel_node, minlength=nnodes),
+        "area": np.bincount(pixel_node, weights=resolution[rows], minlength=nnodes),
+        "m10": np.bincount(pixel_node, weights=rows, minlength=nnodes),
+        "m01": np.bincount(pixel_node, weights=cols, minlength=nnodes),
+        "m20": np.bincount(pixel_node, weights=rows * rows, minlength=nnodes),
+        "m11": np.bincount(pixel_node, weights=rows * cols, minlength=nnodes),
+        "m02": np.bincount(pixel_node, weights=cols * cols, minlength=nnodes),
+    }
+    for key, coordinates, init, reduce in _bbox_reductions(rows, cols, pixel_level.shape):
+        tree[key] = np.full(nnodes, init, dtype=np.intp)
+        reduce.at(tree[key], pixel_node, coordinates)
+    # Accumulation from the leaves (low thresholds) to the root
+    for ilevel in range(nthresholds - 1):
+        nodes = np.flatnonzero(level == ilevel)
+        for key in SUMS:
+            np.add.at(tree[key], parent[nodes], tree[key][nodes])
+        for key, _, _, reduce in _bbox_reductions(rows, cols, pixel_level.shape):
+            reduce.at(tree[key], parent[nodes], tree[key][nodes])
+    return tree
+
+
+def _bbox_reductions(rows: np.ndarray, cols: np.ndarray, shape: tuple) -> tuple:
+    """Bounding box statistics: name, coordinates of the pixels, initial value and reduction"""
+    return (
+        ("row_min", rows, shape[0], np.minimum),
+        ("row_max", rows, -1, np.maximum),
+        ("col_min", cols, shape[1], np.minimum),
+        ("col_max", cols, -1, np.maximum),
+    )
+
+
+def _merge_through_longitudes(tree: dict, isblob: np.ndarray, blobs_sums: dict, ithreshold: int) -> dict:
+    """
+    Merge the blobs of one threshold that are connected through the first and last longitudes
+    (as cb_detection.connectLongitudes does)
+    """
+    seam_nodes = tree["seam_nodes"][ithreshold]
+    onseam = (seam_nodes[:, 0] >= 0) & (seam_nodes[:, 1] >= 0) & (seam_nodes[:, 0] != seam_nodes[:, 1])
+    if not np.any(onseam):
+        return blobs_sums
+    # Index of the blobs among the blobs of this threshold
+    blob_index = np.cumsum(isblob) - 1
+    pairs = blob_index[seam_nodes[onseam]]
+    # union-find on the blobs facing each other
+    group = np.arange(len(blobs_sums["area"]))
+
+    def find(index):
+        while group[index] != index:
+            group[index] = group[group[index]]
+            index = group[index]
+        return index
+
+    for index1, index2 in set(zip(pairs[:, 0].tolist(), pairs[:, 1].tolist())):
+        root1, root2 = find(index1), find(index2)
+        if root1 != root2:
+            group[max(root1, root2)] = min(root1, root2)
+    roots = np.array([find(index) for index in range(len(group))], dtype=np.intp)
+    merged_roots, merged_index = np.unique(roots, return_inverse=True)
+    merged_sums = {}
+    for key in SUMS:
+        merged_sums[key] = np.bincount(merged_index, weights=blobs_sums[key], minlength=len(merged_roots))
+    merged_sums["npixels"] = merged_sums["npixels"].astype(int)
+    for key, reduce in (("row_min", np.minimum), ("row_max", np.maximum), ("col_min", np.minimum), ("col_max", np.maximum)):
+        merged_sums[key] = np.array(blobs_sums[key][merged_roots])
+        reduce.at(merged_sums[key], merged_index, blobs_sums[key])
+    return merged_sums
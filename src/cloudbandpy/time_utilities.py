@@ -27,13 +27,13 @@ def create_list_of_dates(config: dict) -> pd.date_range:
     if config["period_detection"] == 24:
         freq = "1D"
     elif config["period_detection"] == 12:
-        freq = "12H"
+        freq = "12h"
     elif config["period_detection"] == 6:
-        freq = "6H"
+        freq = "6h"
     elif config["period_detection"] == 3:
-        freq = "3H"
+        freq = "3h"
     elif config["period_detection"] == 1:
-        freq = "1H"
+        freq = "1h"
     else:
         logger.error("Detection period must be 24h, 12h, 6h, 3h or 1h!")
         sys.exit(1)
@@ -79,3 +79,19 @@ def add_startend_datetime2config(config: dict) -> tuple:
         else:
             logger.error(f"Error: {e}")
         sys.exit(1)
+
+
+def date_numbers_to_datetime64(date_numbers) -> np.ndarray:
+    """
+    Convert dates stored as integers yyyymmddhhMMSS (eg. date of cloud bands) into numpy datetime64 (seconds)
+    without string formatting
+    """
+    date_numbers = np.asarray(date_numbers, dtype=np.int64)
+    year, rest = np.divmod(date_numbers, 10**10)
+    month, rest = np.divmod(rest, 10**8)
+    day, rest = np.divmod(rest, 10**6)
+    hour, rest = np.divmod(rest, 10**4)
+    minute, second = np.divmod(rest, 10**2)
+    months = ((year - 1970) * 12 + month - 1).astype("datetime64[M]")
+    seconds = (day - 1) * 86400 + hour * 3600 + minute * 60 + second
+    return months.astype("datetime64[s]") + seconds.astype("timedelta64[s]")
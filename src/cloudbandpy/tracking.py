@@ -1,9 +1,13 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-from functools import reduce
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import copy
 import logging
 import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 
 try:
     import cartopy.crs as ccrs
@@ -18,17 +22,33 @@ from matplotlib.patches import ConnectionPatch
 from matplotlib.ticker import MultipleLocator
 from typing import Optional, Set
 
-from .cloudband import CloudBand
+from .cloudband import CloudBand, cloud_bands_columns
 from .figure_tools import set_fontsize
-from .cb_detection import compute_blob_area
+from .cb_detection import make_cloud_bands_map
+from .density import add_cloud_bands_to_density, make_density_accumulator, total_counts
 from .misc import wrapTo180
 
 
 logger = logging.getLogger(__name__)
 
 
-def findCloud(dates, name) -> Optional[CloudBand]:
-    """Find a cloud using its ID in the complete list of dates and clouds"""
+def make_cloud_bands_index(list_of_cloud_bands: list) -> dict:
+    """Index of the cloud bands: position (time index, object index) in the list of lists of cloud bands by id"""
+    return {
+        cloud.id_: (itime, iobject)
+        for itime, clouds in enumerate(list_of_cloud_bands)
+        for iobject, cloud in enumerate(clouds)
+    }
+
+
+def findCloud(dates, name, index: dict = None) -> Optional[CloudBand]:
+    """
+    Find a cloud using its ID in the complete list of dates and clouds
+    If the index of the cloud bands is given (see make_cloud_bands_index), the cloud is found without scanning the list
+    """
+    if index is not None:
+        position = index.get(name)
+        return None if position is None else dates[position[0]][position[1]]
     for d in dates:
         for c in d:
             if c.id_ == name:
@@ -50,39 +70,362 @@ def tracking(list_of_cloud_bands, resolution, overlapfactor: float = 0.1) -> lis
     logger.info("Inheritance tracking in progress")
     list_tracked_cloudband = list_of_cloud_bands.copy()  # copy to avoid side effects
     for idx, clouds in enumerate(list_of_cloud_bands):
-        if len(clouds):
-            for icloud in clouds:
-                # look for parents, starting on second date
-                parents: Set[str] = set()
-                if idx > 0 and len(list_tracked_cloudband[idx - 1]):
-                    for parent_cloud in list_of_cloud_bands[idx - 1]:
-                        if is_in(parent_cloud, icloud, resolution, overlapfactor):
-                            parents.add(parent_cloud.id_)
-                        if is_in(icloud, parent_cloud, resolution, overlapfactor):
-                            parents.add(parent_cloud.id_)
-                icloud.parents = parents
-                # print("cb_id_", icloud.id_, "cloud.parents", icloud.parents)
+        previous_clouds = list_of_cloud_bands[idx - 1] if idx > 0 else []
+        # Only the cloud bands of the previous day whose bounding box intersects the bounding box of the cloud band
+        # can overlap it. Cloud bands crossing the 0/360 seam (connected longitudes) have a bounding box
+        # covering all the longitudes of the domain, so that they are compared with all cloud bands at their latitudes
+        previous_bboxes = bounding_boxes(previous_clouds)
+        for icloud in clouds:
+            # look for parents, starting on second date
+            parents: Set[str] = set()
+            for iparent in intersecting_bboxes(icloud, previous_bboxes):
+                parent_cloud = previous_clouds[iparent]
+                area_intersection = overlap_area(parent_cloud, icloud, resolution)
+                # two-way check: is_in(parent_cloud, icloud) or is_in(icloud, parent_cloud)
+                if area_intersection > overlapfactor * parent_cloud.area or area_intersection > overlapfactor * icloud.area:
+                    parents.add(parent_cloud.id_)
+            icloud.parents = parents
+            # print("cb_id_", icloud.id_, "cloud.parents", icloud.parents)
     logger.info("Inheritance tracking done")
     return list_tracked_cloudband
 
 
+def tracking_from_maps(
+    list_of_cloud_bands: list,
+    resolution: np.ndarray,
+    overlapfactor: float = 0.1,
+    cloud_bands_map: np.ndarray = None,
+    state: dict = None,
+    lookback: int = 1,
+    workers: int = 1,
+) -> list:
+    """
+    Same as tracking, with all the overlaps between the cloud bands of two consecutive days computed at once
+    from the maps of cloud bands (see overlap_matrix)
+    Args:
+        - list_of_cloud_bands: list of lists of cloud bands (1 list per day)
+        - resolution: area of a grid point for each latitude
+        - overlapfactor: see tracking
+        - cloud_bands_map: maps of the cloud bands (time first), where cloud bands are labelled by their index
+            in the list of the day + 1 (see cb_detection.make_cloud_bands_map).
+            If None, the map of each day is made from the cloud bands
+        - state: state of the tracking at the end of the previous period (last days, see tracking_frame,
+            and resolution), eg. the previous year.
+            If given, the cloud bands of the first days get their parents from it, and it is updated with the last days
+            of the period, so that the tracking of the next period can resume from it.
+        - lookback: number of previous days in which parents are looked for. A cloud band without parent the day before
+            gets its parents from the most recent of the previous days where cloud bands without children overlap it,
+            so that a cloud band missing during up to lookback - 1 days does not end its life cycle (1: day before only)
+        - workers: number of processes among which contiguous chunks of days are tracked (see _parallel_tracking)
+    Returns: list of lists of cloud bands, whose parents are set
+    """
+    logger.info("Inheritance tracking in progress")
+    if workers > 1 and len(list_of_cloud_bands) >= 2 * lookback:
+        logger.info(f"Tracking spread over {workers} processes")
+        _parallel_tracking(list_of_cloud_bands, resolution, overlapfactor, cloud_bands_map, state, lookback, workers)
+        logger.info("Inheritance tracking done")
+        return list_of_cloud_bands.copy()
+    # Ring buffer of the last days, the most recent last
+    previous_frames = deque(state["frames"] if state else [], maxlen=lookback)
+    for idx, clouds in enumerate(list_of_cloud_bands):
+        frame = tracking_frame(clouds, None if cloud_bands_map is None else cloud_bands_map[idx])
+        for icloud in clouds:
+            icloud.parents = set()
+        link_to_previous_frames(clouds, frame, previous_frames, resolution, overlapfactor)
+        previous_frames.append(frame)
+    if state is not None:
+        state.update(frames=list(previous_frames), resolution=resolution)
+    logger.info("Inheritance tracking done")
+    return list_of_cloud_bands.copy()
+
+
+def stitch_tracking(list_of_cloud_bands: list, state: dict, overlapfactor: float = 0.1, lookback: int = 1) -> list:
+    """
+    Link the cloud bands of the first days of a period, tracked on its own (eg. one year among years run in parallel),
+    to the cloud bands of the last days of the previous period, given by its tracking state (see tracking_from_maps).
+    The first 'lookback' days are tracked again from the state (the period must be longer than lookback days)
+    Returns: list of lists of cloud bands, whose parents of the first days are updated
+    """
+    if len(list_of_cloud_bands) and state:
+        tracking_from_maps(
+            list_of_cloud_bands[:lookback],
+            state["resolution"],
+            overlapfactor=overlapfactor,
+            state=copy.deepcopy(state),
+            lookback=lookback,
+        )
+    return list_of_cloud_bands
+
+
+def _parallel_tracking(
+    list_of_cloud_bands: list,
+    resolution: np.ndarray,
+    overlapfactor: float,
+    cloud_bands_map: np.ndarray,
+    state: dict,
+    lookback: int,
+    workers: int,
+) -> None:
+    """
+    Spread the tracking over a pool of processes: contiguous chunks of days (of at least lookback days) are tracked
+    independently, then the first days of each chunk are tracked again, in order, from the state at the end
+    of the previous chunk (as stitch_tracking does), so that parents are the same as with the serial tracking.
+    The parents of the cloud bands and the state are updated
+    """
+    ntimes = len(list_of_cloud_bands)
+    nchunks = max(1, min(workers * 4, ntimes // lookback))
+    chunks = [chunk for chunk in np.array_split(np.arange(ntimes), nchunks) if chunk.size]
+    tasks = [
+        (
+            list_of_cloud_bands[chunk[0] : chunk[-1] + 1],
+            resolution,
+            overlapfactor,
+            None if cloud_bands_map is None else cloud_bands_map[chunk[0] : chunk[-1] + 1],
+            lookback,
+        )
+        for chunk in chunks
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_tracking_worker, tasks))
+    # Parents found in the processes
+    for chunk, (chunk_parents, _) in zip(chunks, results):
+        for clouds, parents in zip(list_of_cloud_bands[chunk[0] : chunk[-1] + 1], chunk_parents):
+            for icloud, iparents in zip(clouds, parents):
+                icloud.parents = iparents
+    # Stitching of the chunks, in time order
+    previous_state = state
+    for chunk, (_, chunk_state) in zip(chunks, results):
+        if previous_state:
+            first_days = slice(chunk[0], chunk[0] + lookback)
+            tracking_from_maps(
+                list_of_cloud_bands[first_days],
+                resolution,
+                overlapfactor=overlapfactor,
+                cloud_bands_map=None if cloud_bands_map is None else cloud_bands_map[first_days],
+                state=copy.deepcopy(previous_state),
+                lookback=lookback,
+            )
+        previous_state = chunk_state
+    if state is not None:
+        state.update(previous_state)
+
+
+def _tracking_worker(task: tuple) -> tuple:
+    """Track one chunk of days. Returns the parents of the cloud bands of each day and the state at the end of the chunk"""
+    list_of_cloud_bands, resolution, overlapfactor, cloud_bands_map, lookback = task
+    chunk_state = {}
+    tracking_from_maps(
+        list_of_cloud_bands,
+        resolution,
+        overlapfactor=overlapfactor,
+        cloud_bands_map=cloud_bands_map,
+        state=chunk_state,
+        lookback=lookback,
+    )
+    return [[cloud.parents for cloud in clouds] for clouds in list_of_cloud_bands], chunk_state
+
+
+def tracking_frame(clouds: list, cloud_bands_map: np.ndarray = None) -> dict:
+    """
+    What the tracking needs to know about the cloud bands of one day: their map (see cb_detection.make_cloud_bands_map,
+    None if no cloud band), ids and areas, and whether they have children
+    """
+    if cloud_bands_map is None and len(clouds):
+        cloud_bands_map = make_cloud_bands_map(clouds, clouds[0].domain_shape)
+    return {
+        "map": cloud_bands_map if len(clouds) else None,
+        "ids": np.array([cloud.id_ for cloud in clouds], dtype=np.int64),
+        "areas": np.array([cloud.area for cloud in clouds], dtype=float),
+        "haschildren": np.zeros(len(clouds), dtype=bool),
+    }
+
+
+def link_to_previous_frames(
+    clouds: list, frame: dict, previous_frames, resolution: np.ndarray, overlapfactor: float
+) -> None:
+    """
+    Add to the parents of the cloud bands of one day the cloud bands of the previous days (see tracking_frame),
+    the most recent last. Cloud bands that have no parent the day before get them from the most recent previous day
+    where cloud bands without children overlap them
+    """
+    orphans = np.ones(len(clouds), dtype=bool)
+    for lag, previous_frame in enumerate(reversed(previous_frames), start=1):
+        if not orphans.any():
+            break
+        if not len(previous_frame["ids"]):
+            continue
+        overlaps = overlap_matrix(
+            previous_frame["map"], frame["map"], resolution, len(previous_frame["ids"]), len(clouds)
+        )
+        # two-way check of tracking: overlap larger than a fraction of the area of one of the cloud bands
+        isparent = (overlaps > overlapfactor * previous_frame["areas"][:, None]) | (
+            overlaps > overlapfactor * frame["areas"][None, :]
+        )
+        isparent &= orphans[None, :]
+        if lag > 1:
+            # Before the day before, only cloud bands whose life cycle has ended can be parents
+            isparent &= ~previous_frame["haschildren"][:, None]
+        for iparent, icloud in zip(*np.nonzero(isparent)):
+            clouds[icloud].parents.add(previous_frame["ids"][iparent].item())
+        previous_frame["haschildren"] |= isparent.any(axis=1)
+        orphans &= ~isparent.any(axis=0)
+
+
+def overlap_matrix(
+    labels1: np.ndarray, labels2: np.ndarray, resolution: np.ndarray, nlabels1: int, nlabels2: int
+) -> np.ndarray:
+    """
+    Areas of the overlaps between the objects of two maps of labels (1 to nlabels, 0 = background)
+    computed with one histogram of the pairs of labels weighted by the area of the grid points
+    Returns: array (nlabels1, nlabels2), area of the intersection of the object i + 1 of labels1 and j + 1 of labels2
+    """
+    overlapping = np.flatnonzero((labels1 != 0) & (labels2 != 0))
+    pairs = (labels1.ravel()[overlapping].astype(np.intp) - 1) * nlabels2 + labels2.ravel()[overlapping] - 1
+    weights = resolution[overlapping // labels1.shape[1]]
+    overlaps = np.bincount(pairs, weights=weights, minlength=nlabels1 * nlabels2)
+    return overlaps.reshape(nlabels1, nlabels2)
+
+
 def is_in(orig: "CloudBand", other: "CloudBand", resolution: np.ndarray, overlapfactor: float) -> bool:
     """Check whether the cloud band is in (overlayed over) another cloud band"""
-    intersection = orig.cloud_band_array * other.cloud_band_array
-    area_intersection = compute_blob_area(intersection, 1, resolution)
-    # Plot overlap of cloud bands
-    # import matplotlib.pyplot as plt
-    # plt.figure()
-    # plt.imshow(self.cloud_band_array, alpha=0.5)
-    # plt.imshow(other.cloud_band_array, alpha=0.5)
-    # plt.title(str(area_intersection/self.area))
-    # plt.show(block=True)
+    area_intersection = overlap_area(orig, other, resolution)
     if area_intersection > overlapfactor * orig.area:
         return True
     else:
         return False
 
 
+def bounding_boxes(clouds: list) -> np.ndarray:
+    """Bounding boxes of cloud bands in the domain: array (cloud band, [row start, row stop, column start, column stop])"""
+    bboxes = np.zeros((len(clouds), 4), dtype=int)
+    for icloud, cloud in enumerate(clouds):
+        rows, cols = cloud.bbox
+        bboxes[icloud] = rows.start, rows.stop, cols.start, cols.stop
+    return bboxes
+
+
+def intersecting_bboxes(cloud: "CloudBand", bboxes: np.ndarray) -> np.ndarray:
+    """Indices of the bounding boxes (see bounding_boxes) intersecting the bounding box of a cloud band"""
+    rows, cols = cloud.bbox
+    intersect = (
+        (bboxes[:, 0] < rows.stop) & (rows.start < bboxes[:, 1]) & (bboxes[:, 2] < cols.stop) & (cols.start < bboxes[:, 3])
+    )
+    return np.flatnonzero(intersect)
+
+
+def overlap_area(cloud1: "CloudBand", cloud2: "CloudBand", resolution: np.ndarray) -> float:
+    """Area of the intersection of two cloud bands, computed in the intersection of their bounding boxes"""
+    (rows1, cols1), (rows2, cols2) = cloud1.bbox, cloud2.bbox
+    row_start, row_stop = max(rows1.start, rows2.start), min(rows1.stop, rows2.stop)
+    col_start, col_stop = max(cols1.start, cols2.start), min(cols1.stop, cols2.stop)
+    if row_start >= row_stop or col_start >= col_stop:
+        return 0.0
+    window1 = cloud1.mask[
+        row_start - rows1.start : row_stop - rows1.start, col_start - cols1.start : col_stop - cols1.start
+    ]
+    window2 = cloud2.mask[
+        row_start - rows2.start : row_stop - rows2.start, col_start - cols2.start : col_stop - cols2.start
+    ]
+    # number of grid points of the intersection per latitude, times the area of the grid points
+    intersection = np.count_nonzero(window1 & window2, axis=1)
+    return float(np.sum(intersection * resolution[row_start:row_stop]))
+
+
+def build_tracks(list_of_cloud_bands: list) -> tuple:
+    """
+    Assemble the cloud bands linked by the tracking (parents) into tracks (life cycles).
+    A track is a connected component of the graph of the parent links, its id is the smallest id of its cloud bands.
+    Args: list of lists of cloud bands (1 list per time) whose parents are set (see tracking)
+    Returns: see build_tracks_from_columns
+    """
+    return build_tracks_from_columns(cloud_bands_columns(list_of_cloud_bands))
+
+
+def parent_links(columns: dict, ids: np.ndarray) -> tuple:
+    """
+    Links child -> parent of the cloud bands of the columns (see cloudband.cloud_bands_columns),
+    as positions in the array of ids 'ids'. Parents (or children) that are not in 'ids' are ignored
+    Returns: positions of the children and positions of their parents
+    """
+    child_ids = np.repeat(columns["id"], np.diff(columns["parents_ptr"]))
+    parent_ids = columns["parents"]
+    if len(ids) == 0 or len(parent_ids) == 0:
+        return np.zeros(0, dtype=np.intp), np.zeros(0, dtype=np.intp)
+    sorter = np.argsort(ids)
+    children = sorter[np.minimum(np.searchsorted(ids, child_ids, sorter=sorter), len(ids) - 1)]
+    parents = sorter[np.minimum(np.searchsorted(ids, parent_ids, sorter=sorter), len(ids) - 1)]
+    isin = (ids[children] == child_ids) & (ids[parents] == parent_ids)
+    return children[isin], parents[isin]
+
+
+def build_tracks_from_columns(columns: dict) -> tuple:
+    """
+    Assemble the cloud bands into tracks from their columns (see cloudband.cloud_bands_columns or
+    io_utilities.load_catalogue_columns), without the masks.
+    Needs the columns ntimes, time_index, id, date, area, lon_centroid, lat_centroid, parents and parents_ptr
+    Returns two dictionaries of arrays:
+        - objects: one element per cloud band, sorted by track and time: id, track_id, time_index, date, area,
+            lon_centroid, lat_centroid, number of parents (nparents) and of children (nchildren)
+        - tracks: one element per track, sorted by track_id: track_id, start_date, end_date, start_time_index,
+            end_time_index, duration (number of times), max_area, mean_area, number of merges (cloud bands with
+            several parents) and splits (cloud bands with several children), and the position of the first cloud band
+            of the track in the objects (first_object) and number of cloud bands (nobjects).
+            Path of the centroids of the track k: objects["lon_centroid"][first_object[k] : first_object[k] + nobjects[k]]
+    """
+    logger.info("Track assembly in progress")
+    nclouds = len(columns["id"])
+    objects = {
+        "id": np.asarray(columns["id"], dtype=np.int64),
+        "time_index": np.asarray(columns["time_index"]).astype(int),
+        "date": np.asarray(columns["date"], dtype=np.int64),
+        "area": np.asarray(columns["area"], dtype=float),
+        "lon_centroid": np.asarray(columns["lon_centroid"], dtype=float),
+        "lat_centroid": np.asarray(columns["lat_centroid"], dtype=float),
+    }
+    # Links child -> parent (parents that are not in the list are ignored)
+    children, parents = parent_links(columns, objects["id"])
+    objects["nparents"] = np.bincount(children, minlength=nclouds)
+    objects["nchildren"] = np.bincount(parents, minlength=nclouds)
+    # Tracks are the connected components of the graph of the links
+    graph = coo_matrix((np.ones(len(children)), (children, parents)), shape=(nclouds, nclouds))
+    ntracks, component = connected_components(graph, directed=False)
+    # Id of the track: smallest id of its cloud bands. Tracks are sorted by id
+    track_ids = np.full(ntracks, np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(track_ids, component, objects["id"])
+    order = np.argsort(track_ids)
+    track_ids = track_ids[order]
+    track_index = np.empty(ntracks, dtype=np.intp)
+    track_index[order] = np.arange(ntracks)
+    track_of_object = track_index[component]
+    objects["track_id"] = track_ids[track_of_object]
+    # Cloud bands sorted by track, then by time
+    sort = np.lexsort((objects["id"], objects["time_index"], track_of_object))
+    objects = {key: value[sort] for key, value in objects.items()}
+    track_of_object = track_of_object[sort]
+    # Statistics of the tracks
+    nobjects = np.bincount(track_of_object, minlength=ntracks)
+    first_object = np.cumsum(nobjects) - nobjects
+    last_object = first_object + nobjects - 1
+    max_area = np.zeros(ntracks)
+    np.maximum.at(max_area, track_of_object, objects["area"])
+    tracks = {
+        "track_id": track_ids,
+        "start_date": objects["date"][first_object],
+        "end_date": objects["date"][last_object],
+        "start_time_index": objects["time_index"][first_object],
+        "end_time_index": objects["time_index"][last_object],
+        "duration": objects["time_index"][last_object] - objects["time_index"][first_object] + 1,
+        "max_area": max_area,
+        "mean_area": np.bincount(track_of_object, weights=objects["area"], minlength=ntracks) / np.maximum(nobjects, 1),
+        "merges": np.bincount(track_of_object, weights=objects["nparents"] > 1, minlength=ntracks).astype(int),
+        "splits": np.bincount(track_of_object, weights=objects["nchildren"] > 1, minlength=ntracks).astype(int),
+        "first_object": first_object,
+        "nobjects": nobjects,
+    }
+    logger.info(f"{ntracks} tracks assembled")
+    return objects, tracks
+
+
 def plot_tracking_on_map(
     list_of_cloud_bands: list,
     lons: np.ndarray,
@@ -98,6 +441,7 @@ def plot_tracking_on_map(
     set_fontsize(size=16)
     colors = ["red", "blue", "yellowgreen", "goldenrod", "darkturquoise", "mediumpurple", "darkorange"]
     cid = 0
+    cloud_bands_index = make_cloud_bands_index(list_of_cloud_bands)
     fig, axes = plt.subplots(
         nrows=len(list_of_cloud_bands),
         ncols=1,
@@ -155,7 +499,7 @@ def plot_tracking_on_map(
             lat0 = cloud.lat_centroid
             xyA = ccrs.PlateCarree(central_longitude=180).transform_point(lon0, lat0, ccrs.PlateCarree())
             for parent_id in cloud.parents:
-                parent = findCloud(list_of_cloud_bands, parent_id)
+                parent = findCloud(list_of_cloud_bands, parent_id, cloud_bands_index)
                 lon1 = parent.lon_centroid
                 lat1 = parent.lat_centroid
                 xyB = ccrs.PlateCarree(central_longitude=180).transform_point(lon1, lat1, ccrs.PlateCarree())
@@ -194,6 +538,7 @@ def plot_pix(list_of_cloud_bands: list):
     """Same as previous function without creating a cartopy map"""
     colors = ["red", "blue", "yellowgreen", "goldenrod", "darkturquoise", "mediumpurple", "darkorange"]
     cid = 0
+    cloud_bands_index = make_cloud_bands_index(list_of_cloud_bands)
     _, axes = plt.subplots(len(list_of_cloud_bands), 1)
     for inc, ax in enumerate(axes):
         # display image
@@ -206,7 +551,7 @@ def plot_pix(list_of_cloud_bands: list):
         for cloud in list_of_cloud_bands[inc]:
             # ax.plot(cloud.lon_centroid, cloud.lat_centroid, ".g", markersize=10)
             for parent_id in cloud.parents:
-                parent = findCloud(list_of_cloud_bands, parent_id)
+                parent = findCloud(list_of_cloud_bands, parent_id, cloud_bands_index)
                 con = ConnectionPatch(
                     xyA=(cloud.lon_centroid,cloud.lat_centroid),
                     xyB=(parent.lon_centroid,parent.lat_centroid),
@@ -223,26 +568,32 @@ def plot_pix(list_of_cloud_bands: list):
     return
 
 
-def compute_density(dates: list, list_of_cloud_bands: list) -> np.ndarray:
+def compute_density(lats: np.ndarray, lons: np.ndarray, dates: list, list_of_cloud_bands: list) -> tuple:
     """
     Compute the total number of cloud bands per grid point and the mean number of cloud band per day per year
+    (see density for the accumulation of the counts one time after the other)
     Return:
         - ntot_cb: total number of cloud bands per grid point
         - density: mean number of cloud band per day per year over the period
     """
     logger = logging.getLogger("tracking.compute_density")
-    # To set the shape of the ntot_cb and density,
-    # we need the shape of an array of cloud band (= [len(lons), len(lats)] of domain)
-    # Get the first cloud band of the period
-    onecloudband = reduce(lambda s1, s2: s1 or s2, list_of_cloud_bands)[0]
-    if onecloudband == None or []:
+    accumulator = make_density_accumulator((len(lats), len(lons)))
+    for date, cloud_bands in zip(dates, list_of_cloud_bands):
+        add_cloud_bands_to_density(accumulator, cloud_bands, date)
+    if not any(len(cloud_bands) for cloud_bands in list_of_cloud_bands):
         logger.warning("No cloud band has been detected")
-    ntot_cb = np.zeros(onecloudband.cloud_band_array.shape)
-    density = np.zeros(onecloudband.cloud_band_array.shape)
-    for itime in range(len(dates)):
-        for icb in enumerate(list_of_cloud_bands[itime]):
-            ntot_cb += icb[1].cloud_band_array
-    numberofyear = len(set([el.year for el in dates]))
+    return density_from_accumulator(accumulator, dates)
+
+
+def density_from_accumulator(accumulator: dict, dates: list) -> tuple:
+    """
+    Total number of cloud bands per grid point and mean number of cloud band per day per year
+    from a density accumulator (see density) filled with the times 'dates'
+    """
+    logger = logging.getLogger("tracking.density_from_accumulator")
+    ntot_cb = total_counts(accumulator).astype(float)
+    density = np.zeros(ntot_cb.shape)
+    numberofyear = len(accumulator["years"])
     # check if the period covers one or multiple full years
     if dates[0].month == 1 and dates[0].day == 1 and dates[-1].month == 12 and dates[-1].day == 31:
         density = np.divide(ntot_cb, numberofyear)